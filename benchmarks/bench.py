@@ -0,0 +1,207 @@
+"""
+Status check and booking benchmarks against the local stand-in server.
+
+    python benchmarks/bench.py status --engines http headless-chrome \
+        --courses 1 10 40
+    python benchmarks/bench.py booking --engines http --bookings 10
+
+No request reaches the live site. Browser engines whose driver cannot be
+started are skipped.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hsp.catalog import CourseCatalog  # noqa: E402
+from hsp.credentials import Credentials  # noqa: E402
+from hsp.fakeserver import BOOKABLE, FakeHSPServer, make_courses  # noqa: E402
+from hsp.httpcourse import HTTPCourse  # noqa: E402
+from hsp.trace import percentile  # noqa: E402
+from hsp.session import HTTPSession  # noqa: E402
+
+
+ENGINES = ("http", "headless-chrome", "headless-firefox", "chrome", "firefox")
+
+CREDENTIALS = Credentials(name="Anton", surname="Charlston", gender="M",
+                          street="Gartenstraße", number="25",
+                          zip_code="72072", city="Tübingen", status="S-UNIT",
+                          pid="11111111", email="someone@somedomain.de")
+
+
+class Engine:
+    """
+    Opens a session for one engine and builds courses on it
+    """
+
+    def __init__(self, name, lean=False):
+        self.name = name
+        self.lean = lean
+        self.session = None
+        self.driver = None
+
+    def start(self):
+        if self.name == "http":
+            self.session = HTTPSession()
+        else:
+            from hsp import booking
+            start = getattr(booking, "start_" + self.name.replace("-", "_"))
+            self.driver = start(lean=self.lean)
+
+    def catalog(self, url):
+        if self.session is not None:
+            return CourseCatalog.fetch(self.session, url)
+        return CourseCatalog.from_driver(self.driver, url)
+
+    def course(self, course_id, catalog):
+        if self.session is not None:
+            return HTTPCourse(course_id, self.session, catalog)
+        from hsp.booking import HSPCourse
+        return HSPCourse(course_id, self.driver, catalog=catalog)
+
+    def stop(self):
+        if self.session is not None:
+            self.session.close()
+        if self.driver is not None:
+            self.driver.quit()
+
+
+def summarize(latencies, elapsed):
+    return {
+        "operations": len(latencies),
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed > 0 else None,
+        "p50": percentile(latencies, 50),
+        "p90": percentile(latencies, 90),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies),
+    }
+
+
+def bench_status(engine, count, repeat, server_args):
+    """
+    Resolves the status of 'count' courses with one session and one course
+    list load per repetition
+    """
+    latencies = []
+    startup = []
+    elapsed = 0
+    with FakeHSPServer(make_courses(count), **server_args) as server:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            engine.start()
+            startup.append(time.perf_counter() - started)
+            try:
+                started = time.perf_counter()
+                catalog = engine.catalog(server.course_list_url)
+                for course_id in server.courses:
+                    t = time.perf_counter()
+                    engine.course(course_id, catalog).status()
+                    latencies.append(time.perf_counter() - t)
+                elapsed += time.perf_counter() - started
+            finally:
+                engine.stop()
+
+    result = summarize(latencies, elapsed)
+    result["startup"] = sum(startup) / len(startup)
+    return result
+
+
+def bench_booking(engine, count, server_args, out_dir):
+    """
+    Books 'count' bookable courses one after another on one session
+    """
+    courses = make_courses(count)
+    for course in courses:
+        course["status"] = BOOKABLE
+
+    latencies = []
+    with FakeHSPServer(courses, **server_args) as server:
+        engine.start()
+        try:
+            catalog = engine.catalog(server.course_list_url)
+            started = time.perf_counter()
+            for course_id in server.courses:
+                t = time.perf_counter()
+                course = engine.course(course_id, catalog)
+                course.booking(CREDENTIALS, os.path.join(
+                    out_dir, "{}_{}.png".format(engine.name, course_id)))
+                latencies.append(time.perf_counter() - t)
+            elapsed = time.perf_counter() - started
+        finally:
+            engine.stop()
+        if len(server.bookings) != count:
+            raise RuntimeError("{} of {} bookings arrived".format(
+                len(server.bookings), count))
+    return summarize(latencies, elapsed)
+
+
+def print_result(kind, engine, count, result):
+    line = "{:<8} {:<17} {:>5} courses  p50 {:8.1f}ms  p90 {:8.1f}ms  " \
+        "max {:8.1f}ms  {:8.1f} ops/s".format(
+            kind, engine, count, result["p50"] * 1000, result["p90"] * 1000,
+            result["max"] * 1000, result["throughput"] or 0)
+    if "startup" in result:
+        line += "  startup {:7.1f}ms".format(result["startup"] * 1000)
+    print(line, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("benchmark", choices=("status", "booking"))
+    parser.add_argument("--engines", nargs="+", choices=ENGINES,
+                        default=["http"])
+    parser.add_argument("--courses", nargs="+", type=int, default=[1, 10, 40],
+                        help="Course counts for the status benchmark")
+    parser.add_argument("--bookings", type=int, default=5,
+                        help="Number of bookings for the booking benchmark")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Server side delay per request in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--lean", action="store_true",
+                        help="Start the browsers with the lean profile")
+    parser.add_argument("--json", type=str,
+                        help="Write all results to this file")
+    args = parser.parse_args()
+
+    server_args = {"latency": args.latency,
+                   "failure_rate": args.failure_rate, "seed": 0}
+    results = []
+    with tempfile.TemporaryDirectory() as out_dir:
+        for name in args.engines:
+            engine = Engine(name, lean=args.lean)
+            try:
+                if args.benchmark == "status":
+                    for count in args.courses:
+                        result = bench_status(engine, count, args.repeat,
+                                              server_args)
+                        print_result("status", name, count, result)
+                        results.append(dict(result, benchmark="status",
+                                            engine=name, courses=count,
+                                            lean=args.lean))
+                else:
+                    result = bench_booking(engine, args.bookings,
+                                           server_args, out_dir)
+                    print_result("booking", name, args.bookings, result)
+                    results.append(dict(result, benchmark="booking",
+                                        engine=name, courses=args.bookings,
+                                        lean=args.lean))
+            except Exception as e:
+                if name == "http":
+                    raise
+                print("{:<8} {:<17} skipped: {}".format(
+                    args.benchmark, name, str(e).strip().splitlines()[0]),
+                    flush=True)
+
+    if args.json:
+        with open(args.json, "w") as jf:
+            json.dump(results, jf, indent=2)
+
+
+if __name__ == "__main__":
+    main()
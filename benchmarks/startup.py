@@ -0,0 +1,123 @@
+"""
+CLI startup time benchmark.
+
+    python benchmarks/startup.py --runs 20
+    python benchmarks/startup.py --check
+
+Times commands that never need a browser, each in a fresh interpreter,
+against a bare 'python -c pass', and lists the heavy modules they import.
+With --check it fails if selenium or multiprocessing is imported by any of
+them, or PyYAML for a JSON credentials file.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("selenium", "yaml", "http.client", "ssl", "multiprocessing",
+                 "hsp.booking", "hsp.session")
+
+CREDENTIALS = {"name": "Anton", "surname": "Charlston", "gender": "M",
+               "street": "Gartenstraße", "number": "25", "zipcode": "72072",
+               "city": "Tübingen", "status": "S-UNIT", "pid": "11111111",
+               "email": "someone@somedomain.de"}
+
+# runs the CLI like bin/hsp and reports the loaded heavy modules on exit
+RUNNER = """
+import atexit, json, sys
+sys.path.insert(0, {root!r})
+atexit.register(lambda: sys.stderr.write(
+    "\\nMODULES " + json.dumps([m for m in {heavy!r} if m in sys.modules])))
+sys.argv = ["hsp"] + {argv!r}
+from hsp import main
+main.main()
+"""
+
+
+def write_credentials(directory):
+    json_file = os.path.join(directory, "credentials.json")
+    with open(json_file, "w") as jf:
+        json.dump(CREDENTIALS, jf)
+    yaml_file = os.path.join(directory, "credentials.yaml")
+    with open(yaml_file, "w") as yf:
+        for key, value in CREDENTIALS.items():
+            yf.write('{}: "{}"\n'.format(key, value))
+    return json_file, yaml_file
+
+
+def run(code):
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", code],
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                          universal_newlines=True)
+    elapsed = time.perf_counter() - started
+    modules = []
+    if "MODULES " in proc.stderr:
+        modules = json.loads(proc.stderr.rsplit("MODULES ", 1)[1])
+    return elapsed, modules
+
+
+def bench(code, runs):
+    times = []
+    modules = []
+    for _ in range(runs):
+        elapsed, modules = run(code)
+        times.append(elapsed)
+    return statistics.median(times), modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--check", action="store_true",
+                        help="Fail if selenium (or PyYAML for JSON) is loaded")
+    parser.add_argument("--json", type=str,
+                        help="Write all results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_file, yaml_file = write_credentials(tmp)
+        cases = [
+            ("--version", ["--version"]),
+            ("--help", ["--help"]),
+            ("course-status --help", ["course-status", "--help"]),
+            ("check-credentials json",
+             ["check-credentials", "--credentials", json_file]),
+            ("check-credentials yaml",
+             ["check-credentials", "--credentials", yaml_file]),
+        ]
+
+        baseline, _ = bench("pass", args.runs)
+        print("{:<24} {:8.1f}ms".format("python -c pass", baseline * 1000))
+
+        results = []
+        failed = False
+        for name, argv in cases:
+            code = RUNNER.format(root=ROOT, heavy=HEAVY_MODULES, argv=argv)
+            median, modules = bench(code, args.runs)
+            print("{:<24} {:8.1f}ms  (+{:6.1f}ms)  loads: {}".format(
+                name, median * 1000, (median - baseline) * 1000,
+                ", ".join(modules) or "-"), flush=True)
+            results.append({"case": name, "median": median,
+                            "baseline": baseline, "modules": modules})
+            if "selenium" in modules or "multiprocessing" in modules or \
+                    (name.endswith("json") and "yaml" in modules):
+                failed = True
+
+    if args.json:
+        with open(args.json, "w") as jf:
+            json.dump(results, jf, indent=2)
+
+    if args.check and failed:
+        print("[ERROR] A command loaded modules it does not need")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
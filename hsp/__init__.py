@@ -1,5 +1,41 @@
-from .booking import (HSPCourse, start_firefox, start_headless_firefox,
-                        start_chrome, start_headless_chrome)
-from .credentials import Credentials
 from .errors import (CourseIdNotListed, CourseIdAmbiguous, CourseNotBookable,
-                    InvalidCredentials)
+                     InvalidCredentials)
+
+
+# The public classes are imported on first access, so that importing the
+# package does not load selenium or the HTTP client up front.
+_EXPORTS = {
+    "HSPCourse": "booking",
+    "start_firefox": "booking",
+    "start_headless_firefox": "booking",
+    "start_chrome": "booking",
+    "start_headless_chrome": "booking",
+    "CourseCatalog": "catalog",
+    "CourseRow": "catalog",
+    "HTTPCourse": "httpcourse",
+    "HTTPSession": "session",
+    "DriverPool": "pool",
+    "Credentials": "credentials",
+    "AsyncHTTPSession": "aio",
+    "fetch_status": "aio",
+    "CourseFeed": "feed",
+    "HedgedBooking": "hedge",
+}
+
+__all__ = sorted(_EXPORTS) + ["CourseIdNotListed", "CourseIdAmbiguous",
+                              "CourseNotBookable", "InvalidCredentials"]
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name))
+    import importlib
+    module = importlib.import_module("." + _EXPORTS[name], __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
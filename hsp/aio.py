@@ -0,0 +1,233 @@
+import asyncio
+from collections import OrderedDict, namedtuple
+from urllib.parse import urldefrag, urljoin, urlsplit
+from .catalog import CourseCatalog
+from .parsing import parse_course_page
+from .session import DEFAULT_HEADERS, REDIRECT_CODES, HTTPSession, Response
+from .errors import Error, LoadingFailed
+from . import trace
+
+
+CourseStatus = namedtuple("CourseStatus", [
+    "course_id", "course_name", "time", "weekday", "location", "level",
+    "course_status", "booking_possible", "waitinglist_exists"])
+
+
+class AsyncHTTPSession:
+    """
+    Minimal asyncio HTTP client for GET and HEAD requests.
+    Idle keep-alive connections are pooled per host and shared by all
+    requests of the session. At most 'limit' requests run at once, each one
+    fails with LoadingFailed after 'timeout' seconds.
+    Cookies are not kept, reading course pages does not need them.
+    """
+
+    def __init__(self, limit=10, timeout=20, headers=None):
+        self.limit = limit
+        self.timeout = timeout
+        self.headers = dict(DEFAULT_HEADERS)
+        self.headers.update(headers or {})
+        self._idle = {}  # (scheme, netloc) -> [(reader, writer), ...]
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def _connect(self, scheme, netloc):
+        parts = urlsplit("//" + netloc)
+        https = scheme == "https"
+        port = parts.port or (443 if https else 80)
+        return await asyncio.open_connection(parts.hostname, port,
+                                             ssl=True if https else None)
+
+    async def _acquire(self, key):
+        idle = self._idle.get(key)
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return (reader, writer), True
+            writer.close()
+        return await self._connect(*key), False
+
+    @staticmethod
+    async def _read_response(reader, method):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed by the server")
+        version, status = status_line.split(None, 2)[:2]
+        status = int(status)
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name, value = name.strip().lower(), value.strip()
+            if name in headers:
+                value = headers[name] + ", " + value
+            headers[name] = value
+
+        keep_alive = version == b"HTTP/1.1" and \
+            headers.get("connection", "").lower() != "close"
+
+        if method == "HEAD" or status in (204, 304) or status < 200:
+            content = b""
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    # skip the trailer
+                    while (await reader.readline()) not in (b"\r\n", b"\n",
+                                                           b""):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            content = b"".join(chunks)
+        elif "content-length" in headers:
+            content = await reader.readexactly(int(headers["content-length"]))
+        else:
+            content = await reader.read()
+            keep_alive = False
+
+        return status, headers, content, keep_alive
+
+    async def _send(self, method, url, headers):
+        trace.count("http requests")
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        request_headers = dict(self.headers)
+        request_headers.update(headers or {})
+        request_headers["Host"] = parts.netloc
+        request = "{} {} HTTP/1.1\r\n".format(method, path) + "".join(
+            "{}: {}\r\n".format(k, v) for k, v in request_headers.items())
+        request = (request + "\r\n").encode("latin-1")
+
+        # as in HTTPSession, a pooled connection closed by the server in
+        # the meantime is replaced once
+        for attempt in range(2):
+            (reader, writer), reused = await self._acquire(key)
+            try:
+                writer.write(request)
+                await writer.drain()
+                status, response_headers, content, keep_alive = \
+                    await self._read_response(reader, method)
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                writer.close()
+                if reused and attempt == 0:
+                    continue
+                raise LoadingFailed("{} {}: {}".format(method, url, e))
+            except (OSError, ValueError) as e:
+                writer.close()
+                raise LoadingFailed("{} {}: {}".format(method, url, e))
+            except BaseException:
+                # cancelled by a timeout, the connection is in an unknown state
+                writer.close()
+                raise
+            break
+
+        if keep_alive:
+            self._idle.setdefault(key, []).append((reader, writer))
+        else:
+            writer.close()
+
+        content = HTTPSession._decode(
+            content, response_headers.get("content-encoding"))
+        return Response(url, status, response_headers, content)
+
+    async def _request(self, method, url, headers, max_redirects):
+        for _ in range(max_redirects + 1):
+            response = await self._send(method, url, headers)
+            if response.status not in REDIRECT_CODES:
+                break
+            url = urljoin(url, response.headers.get("location", ""))
+        else:
+            raise LoadingFailed("Too many redirects: {}".format(url))
+
+        if response.status >= 400:
+            raise LoadingFailed("{} {}: HTTP {}".format(method, url,
+                                                        response.status))
+        return response
+
+    async def request(self, method, url, headers=None, max_redirects=5):
+        async with self._semaphore:
+            try:
+                return await asyncio.wait_for(
+                    self._request(method, url, headers, max_redirects),
+                    self.timeout)
+            except asyncio.TimeoutError:
+                raise LoadingFailed("{} {}: Timeout after {}s".format(
+                    method, url, self.timeout))
+
+    async def get(self, url, headers=None):
+        return await self.request("GET", url, headers=headers)
+
+    async def close(self):
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+async def fetch_catalog(session, url=None):
+    """
+    Load and parse the course list
+    """
+    url = url or CourseCatalog.COURSE_LIST_URL
+    response = await session.get(url)
+    return CourseCatalog.from_html(response.text, url)
+
+
+async def fetch_status(course_ids, session=None, catalog=None, limit=10,
+                       timeout=20, url=None):
+    """
+    Resolve the status of many courses concurrently, parsed like HTTPCourse
+    does. Every course page is loaded once, however many of the courses it
+    lists. Returns an OrderedDict of course ID to CourseStatus, or to the
+    Error (e.g. CourseIdNotListed, LoadingFailed) if a course failed.
+    Without a session, one with 'limit' and 'timeout' is opened and closed.
+    """
+    owns_session = session is None
+    if owns_session:
+        session = AsyncHTTPSession(limit=limit, timeout=timeout)
+
+    pages = {}  # course page url -> task loading and parsing it
+
+    async def load_page(page_url):
+        response = await session.get(page_url)
+        return parse_course_page(response.text)
+
+    async def status(course_id):
+        try:
+            row = catalog.get(course_id)
+            page_url = urldefrag(row.course_page_url)[0]
+            if page_url not in pages:
+                pages[page_url] = asyncio.ensure_future(load_page(page_url))
+            course_name, statuses = await pages[page_url]
+            if course_id not in statuses:
+                raise LoadingFailed("Course {} missing on course page "
+                                    "{}".format(course_id,
+                                                row.course_page_url))
+        except Error as e:
+            return e
+        return CourseStatus(course_id, course_name, row.time, row.weekday,
+                            row.location, row.level, *statuses[course_id])
+
+    try:
+        if catalog is None:
+            catalog = await fetch_catalog(session, url)
+        course_ids = list(OrderedDict.fromkeys(str(c) for c in course_ids))
+        results = await asyncio.gather(*(status(c) for c in course_ids))
+        return OrderedDict(zip(course_ids, results))
+    finally:
+        if owns_session:
+            await session.close()
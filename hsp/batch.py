@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from selenium.common.exceptions import WebDriverException
+from .booking import HSPCourse
+from .credentials import Credentials, load_yaml
+from .errors import (Error, CourseNotBookable, InvalidCredentials,
+                     InvalidManifest)
+from .trace import percentile
+
+
+Job = namedtuple("Job", ["name", "course_id", "credentials"])
+
+
+def load_manifest(manifest):
+    """
+    Reads the (course, credentials) pairs of a YAML or JSON manifest.
+    The manifest is a list of jobs, optionally under a 'jobs' key. Each job
+    has a 'course' and 'credentials', either inline or as the path to a
+    credentials file relative to the manifest, and an optional 'name'.
+    Invalid credentials are kept as the InvalidCredentials exception.
+    """
+    with open(manifest, "r") as mf:
+        if manifest.upper().endswith(".JSON"):
+            data = json.load(mf)
+        else:
+            data = load_yaml(mf)
+
+    if isinstance(data, dict):
+        data = data.get("jobs")
+    if not isinstance(data, list):
+        raise InvalidManifest("It has to contain a list of jobs")
+
+    base = os.path.dirname(os.path.abspath(manifest))
+    jobs = []
+    for i, entry in enumerate(data):
+        if not isinstance(entry, dict) or "course" not in entry or \
+                "credentials" not in entry:
+            raise InvalidManifest(
+                "Job {} needs a 'course' and 'credentials'".format(i + 1))
+
+        try:
+            credentials = entry["credentials"]
+            if isinstance(credentials, dict):
+                credentials = Credentials.from_dict(credentials)
+            else:
+                credentials = Credentials.from_file(
+                    os.path.join(base, credentials))
+        except InvalidCredentials as e:
+            credentials = e
+        except OSError as e:
+            credentials = InvalidCredentials(str(e))
+
+        course_id = str(entry["course"])
+        name = str(entry.get("name") or "{:03d}_{}".format(i + 1, course_id))
+        if any(job.name == name for job in jobs):
+            raise InvalidManifest("Job name {} is used twice".format(name))
+        jobs.append(Job(name, course_id, credentials))
+    return jobs
+
+
+class BatchBooking:
+    """
+    Books many (course, credentials) jobs concurrently.
+    At most 'workers' jobs run at once, each on a driver from the pool.
+    A job running longer than 'job_timeout' seconds is recorded as timed out
+    and its driver is quit, which aborts its pending webdriver commands.
+    """
+
+    def __init__(self, jobs, pool, catalog=None, out_dir="batch_results",
+                 workers=4, job_timeout=120):
+        self.jobs = jobs
+        self.pool = pool
+        self.catalog = catalog
+        self.out_dir = out_dir
+        self.workers = workers
+        self.job_timeout = job_timeout
+        self._lock = threading.Lock()
+        self._started = {}   # job name -> start time
+        self._drivers = {}   # job name -> driver in use
+
+    def _result(self, job, status, error=None, confirmation=None):
+        started = self._started.get(job.name)
+        finished = time.time()
+        return {
+            "job": job.name,
+            "course": job.course_id,
+            "status": status,
+            "error": error,
+            "confirmation": confirmation,
+            "started": started,
+            "finished": finished,
+            "latency": None if started is None else finished - started,
+        }
+
+    def _book(self, job):
+        with self._lock:
+            self._started[job.name] = time.time()
+
+        if isinstance(job.credentials, InvalidCredentials):
+            return self._result(job, "invalid credentials",
+                                job.credentials.msg)
+
+        confirmation = os.path.join(self.out_dir, job.name + ".png")
+        driver = self.pool.acquire()
+        with self._lock:
+            self._drivers[job.name] = driver
+        discard = False
+        try:
+            course = HSPCourse(job.course_id, driver, catalog=self.catalog)
+            course.booking(job.credentials, confirmation)
+            return self._result(job, "booked", confirmation=confirmation)
+        except CourseNotBookable as e:
+            return self._result(job, "not bookable", e.msg)
+        except Error as e:
+            return self._result(job, "failed", e.msg)
+        except WebDriverException as e:
+            discard = True
+            return self._result(job, "failed", str(e).strip())
+        finally:
+            with self._lock:
+                self._drivers.pop(job.name, None)
+            self.pool.release(driver, discard=discard)
+
+    def _abort(self, job):
+        with self._lock:
+            driver = self._drivers.pop(job.name, None)
+        if driver is not None:
+            self.pool.release(driver, discard=True)
+
+    def run(self):
+        """
+        Runs all jobs and yields their result dicts as they finish.
+        """
+        os.makedirs(self.out_dir, exist_ok=True)
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        pending = {executor.submit(self._book, job): job for job in self.jobs}
+        try:
+            while pending:
+                done, _ = wait(pending, timeout=0.5,
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = pending.pop(future)
+                    try:
+                        yield future.result()
+                    except Exception as e:
+                        yield self._result(job, "failed", repr(e))
+
+                now = time.time()
+                for future, job in list(pending.items()):
+                    started = self._started.get(job.name)
+                    if started is not None and \
+                            now - started > self.job_timeout:
+                        del pending[future]
+                        self._abort(job)
+                        yield self._result(job, "timeout",
+                                           "Job exceeded {}s".format(
+                                               self.job_timeout))
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    @staticmethod
+    def summary(results, elapsed):
+        latencies = [r["latency"] for r in results
+                     if r["latency"] is not None]
+        counts = {}
+        for r in results:
+            counts[r["status"]] = counts.get(r["status"], 0) + 1
+        return {
+            "jobs": len(results),
+            "statuses": counts,
+            "elapsed": elapsed,
+            "throughput": len(results) / elapsed if elapsed > 0 else None,
+            "latency_p50": percentile(latencies, 50),
+            "latency_p90": percentile(latencies, 90),
+            "latency_p99": percentile(latencies, 99),
+            "latency_max": max(latencies) if latencies else None,
+        }
@@ -1,3 +1,5 @@
+import time
+from urllib.parse import urldefrag
 from selenium import webdriver
 from selenium.webdriver.firefox.options import Options as FirefoxOptions
 from selenium.webdriver.chrome.options import Options as ChromeOptions
@@ -7,88 +9,169 @@ from selenium.webdriver.common.by import By
 from selenium.common.exceptions import (NoSuchElementException,
                                         TimeoutException,
                                         WebDriverException)
-from .errors import (CourseIdNotListed, CourseIdAmbiguous,
-                     CourseNotBookable, InvalidCredentials, LoadingFailed)
-from .conditions import submit_successful
+from .errors import (BookingFailed, CourseIdNotListed, CourseIdAmbiguous,
+                     CourseNotBookable, LoadingFailed)
+from .catalog import CourseCatalog
+from .conditions import page_changed
+from .course import Course
+from .lazy import forget
+from .parsing import classify_status
+from . import scripts, trace
+
+
+# Assets the scraper never looks at, blocked in the lean profile
+LEAN_BLOCKED_URLS = ["*.css", "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+                     "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.ico",
+                     "*.webp"]
+
+LEAN_CHROME_ARGUMENTS = [
+    "--blink-settings=imagesEnabled=false",
+    "--disable-remote-fonts",
+    "--disable-extensions",
+    "--disable-component-extensions-with-background-pages",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--no-first-run",
+    "--metrics-recording-only",
+]
+
+LEAN_CHROME_PREFS = {
+    "profile.managed_default_content_settings.images": 2,
+}
+
+LEAN_FIREFOX_PREFS = {
+    "permissions.default.image": 2,
+    "permissions.default.stylesheet": 2,
+    "browser.display.use_document_fonts": 0,
+    "gfx.downloadable_fonts.enabled": False,
+    "extensions.enabledScopes": 0,
+    "extensions.update.enabled": False,
+    "app.update.enabled": False,
+    "browser.safebrowsing.malware.enabled": False,
+    "browser.safebrowsing.phishing.enabled": False,
+    "browser.safebrowsing.downloads.enabled": False,
+    "network.prefetch-next": False,
+    "network.dns.disablePrefetch": True,
+    "datareporting.policy.dataSubmissionEnabled": False,
+    "toolkit.telemetry.enabled": False,
+    "browser.shell.checkDefaultBrowser": False,
+}
+
+
+def _firefox_options(headless, lean):
 
+    ff_options = FirefoxOptions()
+    ff_options.headless = headless
+    if lean:
+        # return after DOMContentLoaded instead of the full load event
+        ff_options.set_capability("pageLoadStrategy", "eager")
+        for name, value in LEAN_FIREFOX_PREFS.items():
+            ff_options.set_preference(name, value)
+    return ff_options
 
-def start_firefox():
 
-    driver = webdriver.Firefox()
-    return driver
+def _chrome_options(headless, lean):
 
+    chrome_options = ChromeOptions()
+    if headless:
+        chrome_options.add_argument("--headless")
+    if lean:
+        # return after DOMContentLoaded instead of the full load event
+        chrome_options.set_capability("pageLoadStrategy", "eager")
+        for argument in LEAN_CHROME_ARGUMENTS:
+            chrome_options.add_argument(argument)
+        chrome_options.add_experimental_option("prefs", LEAN_CHROME_PREFS)
+    return chrome_options
 
-def start_headless_firefox():
 
-    ff_options = FirefoxOptions()
-    ff_options.headless = True
-    driver = webdriver.Firefox(options=ff_options)
+def _block_assets(driver):
+
+    # chrome has no setting to skip stylesheets and fonts,
+    # so their requests are blocked over the devtools protocol
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs",
+                           {"urls": LEAN_BLOCKED_URLS})
+
+
+def start_firefox(lean=False):
+
+    driver = webdriver.Firefox(options=_firefox_options(False, lean))
     return driver
 
 
-def start_chrome():
+def start_headless_firefox(lean=False):
 
-    driver = webdriver.Chrome()
+    driver = webdriver.Firefox(options=_firefox_options(True, lean))
     return driver
 
 
-def start_headless_chrome():
+def start_chrome(lean=False):
 
-    chrome_options = ChromeOptions()
-    chrome_options.add_argument("--headless")
-    driver = webdriver.Chrome(options=chrome_options)
+    driver = webdriver.Chrome(options=_chrome_options(False, lean))
+    if lean:
+        _block_assets(driver)
     return driver
 
 
-class HSPCourse:
+def start_headless_chrome(lean=False):
     """
+    Start a headless chrome. The lean profile skips images, stylesheets and
+    fonts, extensions and background networking, and returns from page loads
+    as soon as the DOM is ready.
     """
+    driver = webdriver.Chrome(options=_chrome_options(True, lean))
+    if lean:
+        _block_assets(driver)
+    return driver
 
-    BASE_URL = "https://buchung.hsp.uni-tuebingen.de/angebote/aktueller_zeitraum/"
-    COURSE_LIST_URL = BASE_URL + "kurssuche.html"
 
-    def __init__(self, course_id, driver=None):
+class HSPCourse(Course):
+    """
+    A hochschulsport course, scraped with a selenium webdriver.
+    Passing a CourseCatalog skips loading and scanning the course list.
+    Without a driver, a headless browser is started and owned by the course,
+    it is quit by close(). Drivers for many courses can be kept warm in a
+    DriverPool.
+    With use_scripts, course rows and status are read and the booking form
+    is filled with one script each instead of a webdriver command per
+    element, which stays the fallback if a script fails.
+    With same_tab, the booking form opens in the current tab instead of a
+    new one, at the window size the driver was started with.
+    The course details and status are scraped on first access. refresh()
+    makes them load again, a booking reuses the course page the status was
+    read from if it is younger than page_max_age seconds.
+    """
+
+    def __init__(self, course_id, driver=None, catalog=None):
         self.timeout = 20  # waiting time for site to load in seconds
-        self.driver = driver or self._init_driver()
+        self.submit_timeout = 8  # waiting time for a submit to take effect
+        self.submit_retries = 2  # resubmits after a submit_timeout
+        self.submit_backoff = 0.5  # initial pause before a resubmit
+        self.poll_frequency = 0.05  # seconds between page change checks
+        self.use_scripts = True  # one execute_script round trip per region
+        self.same_tab = True  # book in the course page's tab
+        self.page_max_age = 30  # seconds a loaded course page is reused
+        self.booking_gate = None  # shared by the sessions of a hedged booking
+        self._owns_driver = driver is None
+        self.driver = trace.instrument(driver or self._init_driver())
         self.course_id = str(course_id)
-        self.course_page_url = None
-        self.time = None
-        self.weekday = None
-        self.location = None
-        self.level = None
-        self._scrape_course_detail()
-
-        self.course_name = None
-        self.booking_possible = None
-        self.waitinglist_exists = None
-        self.course_status = None
-        self._scrape_course_status()
+        # a catalog lookup is cheap, unlisted courses fail right away
+        if catalog is not None:
+            self._set_course_detail(catalog.get(self.course_id))
 
+        self._page_loaded_at = None
         self._booking_page = None
 
-    def _cl_click_filter_checkboxes(self):
-
-        assert(self.driver.current_url == self.COURSE_LIST_URL)
-
-        # wait until checkbox is loaded
-        nonbookable_cb_id = "bs_anmeldefrei"
-        checkbox_present = EC.visibility_of_element_located(
-            (By.ID, nonbookable_cb_id))
-        WebDriverWait(self.driver, self.timeout).until(checkbox_present)
-
-        # show non-bookable and booked-out courses
-        nonbookable_cb = self.driver.find_element_by_id(nonbookable_cb_id)
-        if not nonbookable_cb.is_selected():
-            nonbookable_cb.click()
-
-        bookedout_cb_id = "bs_ausgebucht"
-        bookedout_cb = self.driver.find_element_by_id(bookedout_cb_id)
-        if not bookedout_cb.is_selected():
-            bookedout_cb.click()
+    @staticmethod
+    def _text_content(element):
+        # unlike .text, this includes rows hidden by the course list filter
+        return " ".join((element.get_attribute("textContent") or "").split())
 
     def _get_el_from_courselist(self, xpath):
 
-        assert(self.driver.current_url == self.COURSE_LIST_URL)
+        assert(self.driver.current_url == CourseCatalog.COURSE_LIST_URL)
         return self.driver.find_element_by_xpath(xpath)
 
     def _get_el_from_coursepage(self, xpath):
@@ -99,22 +182,26 @@ class HSPCourse:
     def _cl_get_time(self, course_row_xpath):
 
         time_xpath = course_row_xpath + '/td[@class="bs_szeit"]'
-        return self._get_el_from_courselist(time_xpath).text
+        el = self._get_el_from_courselist(time_xpath)
+        return self._text_content(el)
 
     def _cl_get_weekday(self, course_row_xpath):
 
         weekday_xpath = course_row_xpath + '/td[@class="bs_stag"]'
-        return self._get_el_from_courselist(weekday_xpath).text
+        el = self._get_el_from_courselist(weekday_xpath)
+        return self._text_content(el)
 
     def _cl_get_location(self, course_row_xpath):
 
         location_xpath = course_row_xpath + '/td[@class="bs_sort"]'
-        return self._get_el_from_courselist(location_xpath).text
+        el = self._get_el_from_courselist(location_xpath)
+        return self._text_content(el)
 
     def _cl_get_level(self, course_row_xpath):
 
         location_xpath = course_row_xpath + '/td[@class="bs_sdet"]'
-        return self._get_el_from_courselist(location_xpath).text
+        el = self._get_el_from_courselist(location_xpath)
+        return self._text_content(el)
 
     def _cl_get_course_link(self, course_row_xpath):
 
@@ -136,21 +223,35 @@ class HSPCourse:
 
     def _scrape_course_detail(self):
 
-        self.driver.get(self.COURSE_LIST_URL)
+        with trace.span("load course list"):
+            self.driver.get(CourseCatalog.COURSE_LIST_URL)
 
         try:
-            self._cl_click_filter_checkboxes()
-
             # course site features a table:
-            # extract the row that starts with the course id
+            # extract the row that starts with the course id.
+            # Rows are read from the DOM whether the client-side filter
+            # shows them or not, so no filter checkbox needs to be clicked
             xpath = '//td[text()="{}"]/parent::tr'
             course_row_xpath = xpath.format(self.course_id)
 
-            self.time = self._cl_get_time(course_row_xpath)
-            self.weekday = self._cl_get_weekday(course_row_xpath)
-            self.location = self._cl_get_location(course_row_xpath)
-            self.level = self._cl_get_level(course_row_xpath)
-            self.course_page_url = self._cl_get_course_link(course_row_xpath)
+            with trace.span("read course row", course=self.course_id):
+                row = self._execute_script(scripts.COURSE_ROW,
+                                           self.course_id)
+                if row is not None and not row["found"]:
+                    raise CourseIdNotListed(self.course_id)
+                if row is not None:
+                    self.time = row["time"]
+                    self.weekday = row["weekday"]
+                    self.location = row["location"]
+                    self.level = row["level"]
+                    self.course_page_url = row["href"]
+                else:
+                    self.time = self._cl_get_time(course_row_xpath)
+                    self.weekday = self._cl_get_weekday(course_row_xpath)
+                    self.location = self._cl_get_location(course_row_xpath)
+                    self.level = self._cl_get_level(course_row_xpath)
+                    self.course_page_url = self._cl_get_course_link(
+                        course_row_xpath)
 
         except TimeoutException:
             raise LoadingFailed("Timeout while loading course list page")
@@ -158,35 +259,80 @@ class HSPCourse:
         except NoSuchElementException:
             raise CourseIdNotListed(self.course_id)
 
-    def _scrape_course_status(self):
-
-        self.driver.get(self.course_page_url)
+    def _set_course_detail(self, row):
 
-        self.course_name = self._cp_get_course_name()
-        bookbtn_or_status = self._cp_get_bookingbtn_or_status_element()
+        self.time = row.time
+        self.weekday = row.weekday
+        self.location = row.location
+        self.level = row.level
+        self.course_page_url = row.course_page_url
 
-        # If bookbtn_or_status is a <span> ... </span> element,
-        # the course is not bookable and there is it contains a
-        # no-booking-possible status
-        if bookbtn_or_status.tag_name == "span":
-            self.course_status = bookbtn_or_status.text
-            self.booking_possible = False
-            self.waitinglist_exists = False
+    def _scrape_course_status(self):
 
-        elif "bs_btn_warteliste" in bookbtn_or_status.get_attribute("class"):
-            self.course_status = "queue signup"
-            self.booking_possible = False
-            self.waitinglist_exists = True
+        with trace.span("load course page", course=self.course_id):
+            self.driver.get(self.course_page_url)
+        self._page_loaded_at = time.monotonic()
+
+        with trace.span("read course status", course=self.course_id):
+            page = self._execute_script(scripts.COURSE_STATUS,
+                                        self.course_id)
+            if page is not None and None not in (page["name"], page["tag"]):
+                course_name = page["name"]
+                tag_name, css_class, text = \
+                    page["tag"], page["cls"], page["text"]
+            else:
+                course_name = self._cp_get_course_name()
+                bookbtn_or_status = \
+                    self._cp_get_bookingbtn_or_status_element()
+
+                # only a <span> status element carries text that is needed
+                tag_name = bookbtn_or_status.tag_name
+                if tag_name == "span":
+                    css_class, text = None, bookbtn_or_status.text
+                else:
+                    css_class = bookbtn_or_status.get_attribute("class")
+                    text = None
+
+        # assigned only once the page was read
+        self.course_name = course_name
+        (self.course_status,
+         self.booking_possible,
+         self.waitinglist_exists) = classify_status(tag_name, css_class, text)
+
+    def refresh(self, detail=False):
+        """
+        Forget the scraped status, and with detail=True the course list row,
+        so they are loaded again on the next access
+        """
+        forget(self, *self.STATUS_FIELDS)
+        if detail:
+            forget(self, *self.DETAIL_FIELDS)
+        self._page_loaded_at = None
 
-        elif "bs_btn_buchen" in bookbtn_or_status.get_attribute("class"):
-            self.course_status = "booking possible"
-            self.booking_possible = True
-            self.waitinglist_exists = False
+    def refresh_status(self):
+        """
+        Reload the course page and update the booking status. If the page
+        cannot be read, LoadingFailed is raised and the previous status kept.
+        """
+        self._page_loaded_at = None
+        try:
+            self._scrape_course_status()
+        except (NoSuchElementException, TimeoutException):
+            raise LoadingFailed("Course page {} could not be read".format(
+                self.course_page_url))
 
-        else:
-            self.course_status = "unknown"
-            self.booking_possible = False
-            self.waitinglist_exists = False
+    def _execute_script(self, script, *args):
+        """
+        Run one of the scripts in hsp.scripts. Returns None if scripts are
+        disabled or the script failed, the caller then falls back to
+        webdriver commands per element.
+        """
+        if not self.use_scripts:
+            return None
+        try:
+            return self.driver.execute_script(script, *args)
+        except WebDriverException:
+            return None
 
     def _init_driver(self):
 
@@ -196,36 +342,42 @@ class HSPCourse:
             print(e)
             print("[!] Loading Chrome webdriver failed")
             print("... Attempting to use Firefox webdriver")
-            driver = start_headless_chrome()
+            driver = start_headless_firefox()
         return driver
 
-    def info(self):
-        infostr = "#{}: {} {}, {} {}".format(self.course_id or "",
-                                             self.course_name or "",
-                                             self.level or "",
-                                             self.weekday or "",
-                                             self.time or "")
-        return infostr
-
-    def status(self):
-        return "Status: {}".format(self.course_status)
-
-    def is_bookable(self):
-        return self.booking_possible
-
-    def has_waitinglist(self):
-        return self.waitinglist_exists
+    def close(self):
+        """
+        Quit the webdriver, if it was started by this course
+        """
+        if self._owns_driver and self.driver is not None:
+            self.driver.quit()
+            self.driver = None
 
     def _switch_to_booking_page(self):
 
         if self.has_waitinglist() or not self.is_bookable():
             raise CourseNotBookable(self.course_id, self.status())
 
-        self.driver.get(self.course_page_url)
+        # the status was read from the course page, which is still open
+        # unless it is too old or the driver moved on
+        if not self._course_page_is_fresh():
+            self.driver.get(self.course_page_url)
 
         # at this point, the course is bookable
         booking_btn = self._cp_get_bookingbtn_or_status_element()
 
+        if self.same_tab and self._open_form_in_same_tab(booking_btn):
+            # clicking sends the button's name, which selects the course
+            booking_btn.click()
+            wait = WebDriverWait(self.driver, self.timeout,
+                                 poll_frequency=self.poll_frequency)
+            try:
+                wait.until(EC.staleness_of(booking_btn))
+            except TimeoutException:
+                raise LoadingFailed("Booking page did not load")
+            self._booking_page = self.driver.current_url
+            return
+
         # snapshot of open windows / tabs
         old_windows = self.driver.window_handles
 
@@ -243,64 +395,103 @@ class HSPCourse:
 
         self._booking_page = self.driver.current_url
 
-    def _bp_enter_personal_details(self, credentials):
+    def _open_form_in_same_tab(self, button):
+        """
+        Drop the target of the button's form, returns False if that failed
+        and the booking page opens in a new tab
+        """
+        try:
+            return bool(self.driver.execute_script(scripts.SAME_TAB_FORM,
+                                                   button))
+        except WebDriverException:
+            return False
 
-        assert (self.driver.current_url == self._booking_page)
+    def _course_page_is_fresh(self):
 
-        if not credentials or not credentials.is_valid:
-            raise InvalidCredentials("Credentials are invalid")
+        if self._page_loaded_at is None or \
+                time.monotonic() - self._page_loaded_at > self.page_max_age:
+            return False
+        return urldefrag(self.driver.current_url)[0] == \
+            urldefrag(self.course_page_url)[0]
+
+    def _bp_personal_fields(self, credentials):
+        """
+        The form fields to fill in as (xpath, value) pairs,
+        elements with a value of None are clicked. Values are strings, as
+        FILL_FORM compares them to the values read back from the fields.
+        """
+        values = self._personal_values(credentials)
 
         # gender radio select
         gender_xpath = '//input[@name="sex"][@value="{}"]'.format(
-            credentials.gender)
-        self.driver.find_element_by_xpath(gender_xpath).click()
+            values["gender"])
+        fields = [(gender_xpath, None)]
 
         # name field
         name_xpath = '//input[@id="BS_F1100"][@name="vorname"]'
-        self.driver.find_element_by_xpath(name_xpath).send_keys(
-            credentials.name)
+        fields.append((name_xpath, values["name"]))
 
         # surname field
         surname_xpath = '//input[@id="BS_F1200"][@name="name"]'
-        self.driver.find_element_by_xpath(surname_xpath).send_keys(
-            credentials.surname)
+        fields.append((surname_xpath, values["surname"]))
 
         # street+no field
         street_xpath = '//input[@id="BS_F1300"][@name="strasse"]'
-        self.driver.find_element_by_xpath(street_xpath).send_keys(
-            credentials.street + " " + credentials.number)
+        fields.append((street_xpath, values["street"]))
 
         # zip+city field
         city_xpath = '//input[@id="BS_F1400"][@name="ort"]'
-        self.driver.find_element_by_xpath(city_xpath).send_keys(
-            credentials.zip_code + " " + credentials.city)
+        fields.append((city_xpath, values["city"]))
 
         # status dropdown and matriculation number / employee phone
         status_xpath_template = '//select[@id="BS_F1600"]//option[@value="{}"]'
-        status_xpath = status_xpath_template.format(credentials.status)
+        status_xpath = status_xpath_template.format(values["status"])
         # student status
-        if credentials.status in ("S-UNIT", "S-aH"):
-            self.driver.find_element_by_xpath(status_xpath).click()
+        if values["status"] in ("S-UNIT", "S-aH"):
+            fields.append((status_xpath, None))
             pid_xpath = '//input[@id="BS_F1700"][@name="matnr"]'
-            self.driver.find_element_by_xpath(pid_xpath).send_keys(
-                credentials.pid)
+            fields.append((pid_xpath, values["pid"]))
         # employee status
-        elif credentials.status in ("B-UNIT", "B-UKT", "B-aH"):
-            self.driver.find_element_by_xpath(status_xpath).click()
+        elif values["status"] in ("B-UNIT", "B-UKT", "B-aH"):
+            fields.append((status_xpath, None))
             pid_xpath = '//input[@id="BS_F1700"][@name="mitnr"]'
-            self.driver.find_element_by_xpath(pid_xpath).send_keys(
-                credentials.pid)
-        elif credentials.status == "Extern":
-            self.driver.find_element_by_xpath(status_xpath).click()
+            fields.append((pid_xpath, values["pid"]))
+        elif values["status"] == "Extern":
+            fields.append((status_xpath, None))
 
         # email field
         email_xpath = '//input[@id="BS_F2000"][@name="email"]'
-        self.driver.find_element_by_xpath(email_xpath).send_keys(
-            credentials.email)
+        fields.append((email_xpath, values["email"]))
 
         # agree to EULA
         eula_xpath = '//input[@name="tnbed"]'
-        self.driver.find_element_by_xpath(eula_xpath).click()
+        fields.append((eula_xpath, None))
+
+        return fields
+
+    def _bp_enter_personal_details(self, credentials):
+
+        assert (self.driver.current_url == self._booking_page)
+
+        # raises InvalidCredentials before anything is filled in
+        fields = self._bp_personal_fields(credentials)
+
+        # fill in and check all fields at once, the script does not
+        # touch the form if any field is missing
+        result = self._execute_script(scripts.FILL_FORM,
+                                      [list(field) for field in fields])
+        if result is not None and not result["missing"]:
+            if result["wrong"]:
+                raise BookingFailed("Form fields could not be filled in: " +
+                                    ", ".join(result["wrong"]))
+            return
+
+        for xpath, value in fields:
+            element = self.driver.find_element_by_xpath(xpath)
+            if value is None:
+                element.click()
+            else:
+                element.send_keys(value)
 
     def _bp_enter_confirm_email(self, email):
 
@@ -311,20 +502,49 @@ class HSPCourse:
 
         try:
             wait = WebDriverWait(self.driver, 5)
-            email_input = wait.until(EC.visibility_of_element_located(locator))
-            email_input.send_keys(email)
+            email_input = wait.until(EC.presence_of_element_located(locator))
         except TimeoutException:
-            pass
+            return
+
+        # set in the DOM, the field need not be scrolled into view
+        result = self._execute_script(scripts.FILL_FORM, [[xpath, email]])
+        if result is None or result["missing"] or result["wrong"]:
+            email_input.send_keys(email)
 
     def _retry_submit(self, submit_loc, control_loc):
         """
-        Retry submitting, until control_loc disappears
+        Submit once and wait until the page changes, which is detected by the
+        submit element going stale and control_loc missing on the new page.
+        Only if that does not happen within submit_timeout, the form is
+        submitted again, at most submit_retries times with growing pauses.
         """
 
         assert(self.driver.current_url == self._booking_page)
 
-        wait = WebDriverWait(self.driver, self.timeout)
-        wait.until(submit_successful(submit_loc, control_loc))
+        for attempt in range(self.submit_retries + 1):
+            with trace.span("submit attempt", attempt=attempt):
+                try:
+                    submit_el = self.driver.find_element(*submit_loc)
+                except NoSuchElementException:
+                    # the page may have changed after the previous attempt
+                    if attempt > 0 and \
+                            not self.driver.find_elements(*control_loc):
+                        return
+                    raise
+
+                submit_el.submit()
+
+                wait = WebDriverWait(self.driver, self.submit_timeout,
+                                     poll_frequency=self.poll_frequency)
+                try:
+                    wait.until(page_changed(submit_el, control_loc))
+                    return
+                except TimeoutException:
+                    if attempt == self.submit_retries:
+                        raise
+
+            with trace.span("submit backoff", attempt=attempt):
+                time.sleep(self.submit_backoff * 2 ** attempt)
 
     def _bp_wait_until_submit(self):
         """
@@ -363,21 +583,35 @@ class HSPCourse:
 
     def booking(self, credentials, confirmation_file=None):
 
-        self._switch_to_booking_page()
-
-        # verify and fill in the personal data
-        self._bp_enter_personal_details(credentials)
-
-        # wait until inputs are submited and page changes
-        self._bp_wait_until_submit()
-
-        # fill in confirm email field, if it exists
-        self._bp_enter_confirm_email(credentials.email)
-
-        # wait until confirm button is pressed and page changes
-        self._bp_wait_until_confirm()
-
-        self._save_screenshot(confirmation_file)
-
-        # close the driver
-        # self.driver.quit()
+        with trace.span("booking", course=self.course_id):
+            self._pass_gate("open booking page")
+            with trace.span("open booking page"):
+                self._switch_to_booking_page()
+
+            # verify and fill in the personal data
+            self._pass_gate("enter personal details")
+            with trace.span("enter personal details"):
+                self._bp_enter_personal_details(credentials)
+
+            # wait until inputs are submited and page changes
+            self._pass_gate("submit personal details")
+            with trace.span("submit personal details"):
+                self._bp_wait_until_submit()
+
+            # fill in confirm email field, if it exists
+            self._pass_gate("enter confirm email")
+            with trace.span("enter confirm email"):
+                self._bp_enter_confirm_email(str(credentials.email))
+
+            # wait until confirm button is pressed and page changes,
+            # in a hedged booking only one session gets past the gate
+            self._pass_gate("confirm")
+            with trace.span("confirm booking"):
+                self._bp_wait_until_confirm()
+
+            with trace.span("save confirmation"):
+                self._save_screenshot(confirmation_file)
+
+        # the driver is not quit here, so the session can be reused. An own
+        # driver is quit by close() or when leaving a 'with' block, a
+        # shared one by its owner, e.g. the DriverPool or the hsp daemon
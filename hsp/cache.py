@@ -0,0 +1,98 @@
+import json
+import os
+import time
+from .catalog import CourseCatalog
+from .parsing import parse_course_list
+from .session import HTTPSession
+
+
+DEFAULT_TTL = 24 * 60 * 60  # seconds
+
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or \
+        os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "hsp")
+
+
+class CourseListCache:
+    """
+    On-disk cache of the parsed course list.
+    Within the TTL the cached rows are used without any request, after that
+    the course list is revalidated with If-None-Match / If-Modified-Since
+    and only downloaded and parsed again if it changed.
+    """
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL):
+        self.path = path or os.path.join(default_cache_dir(), "courselist.json")
+        self.ttl = ttl
+
+    def _read(self, url):
+        try:
+            with open(self.path, "r") as cf:
+                entry = json.load(cf)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or entry.get("url") != url:
+            return None
+        return entry
+
+    def _write(self, entry):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # write to a temporary file first, so readers never see partial data
+        tmpfile = "{}.{}.tmp".format(self.path, os.getpid())
+        with open(tmpfile, "w") as cf:
+            json.dump(entry, cf)
+        os.replace(tmpfile, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def load(self, session=None, url=None, refresh=False):
+        """
+        Returns a CourseCatalog, from the cache if possible.
+        With refresh=True the cached course list is ignored and replaced.
+        """
+        url = url or CourseCatalog.COURSE_LIST_URL
+        entry = None if refresh else self._read(url)
+
+        if entry is not None and time.time() - entry["fetched"] < self.ttl:
+            return CourseCatalog(entry["rows"])
+
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        if session is None:
+            with HTTPSession() as session:
+                response = session.get(url, headers=headers)
+        else:
+            response = session.get(url, headers=headers)
+
+        if response.status == 304 and entry is not None:
+            entry["fetched"] = time.time()
+        else:
+            entry = {
+                "url": url,
+                "fetched": time.time(),
+                "etag": response.headers.get("etag"),
+                "last_modified": response.headers.get("last-modified"),
+                "rows": parse_course_list(response.text, url),
+            }
+
+        try:
+            self._write(entry)
+        except OSError:
+            # an unwritable cache must not break status checks or bookings
+            pass
+
+        return CourseCatalog(entry["rows"])
@@ -0,0 +1,81 @@
+from collections import namedtuple
+from .parsing import parse_course_list
+from .session import HTTPSession
+from .errors import CourseIdNotListed, CourseIdAmbiguous
+
+
+CourseRow = namedtuple("CourseRow", ["course_id", "time", "weekday",
+                                     "location", "level", "course_page_url"])
+
+
+class CourseCatalog:
+    """
+    In-memory index of the course list, keyed by course ID.
+    The course list page is parsed once, after that every course lookup is
+    a dict access instead of another page load and table scan.
+    """
+
+    BASE_URL = "https://buchung.hsp.uni-tuebingen.de/angebote/aktueller_zeitraum/"
+    COURSE_LIST_URL = BASE_URL + "kurssuche.html"
+
+    def __init__(self, rows=()):
+        self._rows = {}
+        self._ambiguous = set()
+        for row in rows:
+            self.add(row)
+
+    def add(self, row):
+        if not isinstance(row, CourseRow):
+            row = CourseRow(**row)
+
+        known = self._rows.get(row.course_id)
+        if known is not None and known != row:
+            self._ambiguous.add(row.course_id)
+        elif known is None:
+            self._rows[row.course_id] = row
+
+    def get(self, course_id):
+        course_id = str(course_id)
+        if course_id in self._ambiguous:
+            raise CourseIdAmbiguous(course_id)
+        try:
+            row = self._rows[course_id]
+        except KeyError:
+            raise CourseIdNotListed(course_id)
+        if not row.course_page_url:
+            raise CourseIdNotListed(course_id)
+        return row
+
+    def __contains__(self, course_id):
+        return str(course_id) in self._rows
+
+    def __iter__(self):
+        return iter(self._rows.values())
+
+    def __len__(self):
+        return len(self._rows)
+
+    @classmethod
+    def from_html(cls, html, url=None):
+        return cls(parse_course_list(html, url or cls.COURSE_LIST_URL))
+
+    @classmethod
+    def fetch(cls, session=None, url=None):
+        """
+        Load the course list with a plain HTTP session
+        """
+        url = url or cls.COURSE_LIST_URL
+        if session is None:
+            with HTTPSession() as session:
+                return cls.from_html(session.get(url).text, url)
+        return cls.from_html(session.get(url).text, url)
+
+    @classmethod
+    def from_driver(cls, driver, url=None):
+        """
+        Load the course list with a webdriver and parse the page source.
+        All rows are part of the source, regardless of the filter checkboxes.
+        """
+        url = url or cls.COURSE_LIST_URL
+        driver.get(url)
+        return cls.from_html(driver.page_source, url)
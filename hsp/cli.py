@@ -1,13 +1,19 @@
 import argparse
 import os
+from datetime import datetime
 
 
 class InputFileAction(argparse.Action):
     """
     Handles input files.
     Binds an InputFile object to the arparse namespace.
+    With extensions=None, files of any type are accepted.
     """
 
+    def __init__(self, *args, extensions=("JSON", "YAML"), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.extensions = extensions
+
     def __call__(self, parser, namespace, values, option_string=None):
         try:
             if len(values) == 1:
@@ -15,10 +21,10 @@ class InputFileAction(argparse.Action):
                 if not os.path.exists(file):
                     msg = "File not found: {}".format(file)
                     raise(parser.error(msg))
-                if not file.upper().endswith("JSON") and \
-                   not file.upper().endswith("YAML"):
+                if self.extensions and \
+                        not file.upper().endswith(self.extensions):
                     msg = "Invalid file ending: {}.".format(file)
-                    msg += "JSON or YAML required!"
+                    msg += " or ".join(self.extensions) + " required!"
                     raise(parser.error(msg))
             else:
                 msg = "More than one input file provided."
@@ -61,22 +67,64 @@ class OutfileAction(argparse.Action):
         setattr(namespace, self.dest, file)
 
 
-def add_credentials_arg(subparser):
+def add_credentials_arg(subparser, required=True):
     subparser.add_argument(
             "--credentials", type=str,
-            action=InputFileAction, required=True, nargs=1,
-            help="Path to a json or yaml file with booking credentials")
+            action=InputFileAction, required=required, nargs=1,
+            extensions=("JSON", "YAML", "YML"),
+            help="Path to a json or yaml file with booking credentials, " +
+            "or a credentials store with --profile")
+    subparser.add_argument(
+            "--profile", type=str,
+            help="Name of the profile to use from the credentials store " +
+            "given with --credentials")
+
 
+def add_course_arg(subparser, multiple=False):
+    if not multiple:
+        subparser.add_argument(
+            "--course", type=str, required=True,
+            help="ID of the hochschulsport course")
+        return
 
-def add_course_arg(subparser):
     subparser.add_argument(
-        "--course", type=str, required=True,
-        help="ID of the hochschulsport course")
+        "--course", type=str, nargs="+", action="extend", default=[],
+        help="IDs of one or more hochschulsport courses")
+    subparser.add_argument(
+        "--course-file", type=str, action=InputFileAction, nargs=1,
+        extensions=None,
+        help="Path to a text or CSV file with one course per line, " +
+        "its ID in the first column")
 
 
-def add_browser_selection_group(subparser):
+def add_cache_args(subparser):
+    cache_select = subparser.add_mutually_exclusive_group(required=False)
+    cache_select.add_argument(
+            "--no-cache", action="store_true",
+            help="Neither read nor write the local course list cache")
+    cache_select.add_argument(
+            "--refresh", action="store_true",
+            help="Download the course list again and replace the " +
+            "cached copy")
+    subparser.add_argument(
+            "--cache-ttl", type=int, default=24 * 60 * 60, metavar="SECONDS",
+            help="Seconds a cached course list is used without " +
+            "revalidation (default: one day)")
+
+
+def add_browser_selection_group(subparser, http=None, profile="full"):
+    subparser.add_argument(
+            "--browser-profile", choices=("lean", "full"), default=profile,
+            help="'lean' skips images, stylesheets and fonts, extensions " +
+            "and background networking and does not wait for the full " +
+            "page load. 'full' loads pages like a normal browser, which " +
+            "the booking confirmation screenshot needs " +
+            "(default: {})".format(profile))
     browser_select = subparser.add_mutually_exclusive_group(
                         required=False)
+    if http:
+        browser_select.add_argument(
+                "--use-http", action="store_true", help=http)
     browser_select.add_argument(
             "--use-firefox", action="store_true",
             help="Use a firefox gui session during the " +
@@ -97,6 +145,28 @@ def add_browser_selection_group(subparser):
             "booking process. This is used by default.")
 
 
+def add_trace_arg(subparser):
+    subparser.add_argument(
+            "--trace", type=str, metavar="FILE",
+            help="Write timed spans of all phases with their webdriver " +
+            "command and HTTP request counts to FILE, in the Chrome " +
+            "trace event format (chrome://tracing, ui.perfetto.dev)")
+
+
+def add_socket_arg(subparser):
+    subparser.add_argument(
+            "--socket", type=str, metavar="PATH",
+            help="Unix socket of the hsp daemon (default: " +
+            "$XDG_RUNTIME_DIR/hsp.sock or ~/.cache/hsp/hsp.sock)")
+
+
+def add_daemon_args(subparser):
+    add_socket_arg(subparser)
+    subparser.add_argument(
+            "--no-daemon", action="store_true",
+            help="Do not use a running 'hsp serve' daemon")
+
+
 def parse_args():
 
     parser = argparse.ArgumentParser(
@@ -115,14 +185,34 @@ def parse_args():
     creds_parser = subparsers.add_parser(
                         "check-credentials", help="Check " +
                         "the validity of a provided credentials file")
-    add_credentials_arg(creds_parser)
+    add_credentials_arg(creds_parser, required=False)
+    creds_parser.add_argument(
+            "--store", type=str, nargs="+", metavar="PATH",
+            help="Check all profiles of credentials store files, " +
+            "credentials files and directories of credentials files")
+    creds_parser.add_argument(
+            "--report", type=str, metavar="FILE",
+            help="Write a JSON report of all profiles with their errors " +
+            "to FILE, '-' for stdout")
+    creds_parser.add_argument(
+            "--workers", type=int, default=None,
+            help="Number of processes parsing files in parallel " +
+            "(default: one per CPU)")
 
     # STATUS CHECKING SUBCOMMAND
     status_parser = subparsers.add_parser(
                         "course-status", help="Check the " +
                         "status of a hochschulsport course")
-    add_course_arg(status_parser)
-    add_browser_selection_group(status_parser)
+    add_course_arg(status_parser, multiple=True)
+    add_browser_selection_group(
+        status_parser,
+        http="Only use plain HTTP requests without a browser. " +
+        "By default they are tried first and a headless chrome " +
+        "session is used as fallback.",
+        profile="lean")
+    add_cache_args(status_parser)
+    add_trace_arg(status_parser)
+    add_daemon_args(status_parser)
 
     # BOOKING SUBCOMMAND
     booking_parser = subparsers.add_parser(
@@ -130,8 +220,173 @@ def parse_args():
                         help="book a hochschulsport course")
     add_credentials_arg(booking_parser)
     add_course_arg(booking_parser)
-    add_browser_selection_group(booking_parser)
+    add_browser_selection_group(
+        booking_parser,
+        http="Book with plain HTTP requests instead of a browser. " +
+        "The confirmation page is saved as HTML.")
+    add_cache_args(booking_parser)
+    booking_parser.add_argument(
+            "--booking-out", default="confirmation.png",
+            action=OutfileAction,
+            help="File destination to write a screenshot of the" +
+            "confirmation page to. PNG format will be used.")
+    booking_parser.add_argument(
+            "--at", type=datetime.fromisoformat, metavar="DATETIME",
+            help="Stage the booking and submit it at this time, " +
+            "e.g. 2026-10-20T08:00:00")
+    booking_parser.add_argument(
+            "--warmup", type=float, default=30, metavar="SECONDS",
+            help="Seconds before --at to reload the course page for warm " +
+            "connections (default: 30)")
+    booking_parser.add_argument(
+            "--grace", type=float, default=60, metavar="SECONDS",
+            help="Seconds after --at to keep checking, in case the " +
+            "registration opens late (default: 60)")
+    booking_parser.add_argument(
+            "--no-clock-sync", action="store_true",
+            help="Use the local clock for --at instead of correcting it " +
+            "by the estimated server clock offset")
+    booking_parser.add_argument(
+            "--hedge", type=float, metavar="SECONDS",
+            help="Start another independent session whenever the booking " +
+            "made no progress for this many seconds. Only the first " +
+            "session to reach the confirmation sends it.")
     booking_parser.add_argument(
+            "--hedge-sessions", type=int, default=2,
+            help="Maximum number of sessions of a --hedge booking " +
+            "(default: 2)")
+    add_trace_arg(booking_parser)
+    add_daemon_args(booking_parser)
+
+    # BATCH BOOKING SUBCOMMAND
+    batch_parser = subparsers.add_parser(
+                        "batch-book",
+                        help="book many courses with different credentials " +
+                        "concurrently, as listed in a manifest file")
+    batch_parser.add_argument(
+            "manifest", type=str, action=InputFileAction, nargs=1,
+            extensions=("YAML", "YML", "JSON"),
+            help="YAML or JSON file listing the jobs, each with a " +
+            "'course' and 'credentials' (inline or a file path)")
+    add_browser_selection_group(batch_parser)
+    add_cache_args(batch_parser)
+    batch_parser.add_argument(
+            "--workers", type=int, default=4,
+            help="Number of concurrent browser sessions (default: 4)")
+    batch_parser.add_argument(
+            "--job-timeout", type=float, default=120, metavar="SECONDS",
+            help="Seconds after which a job is aborted (default: 120)")
+    batch_parser.add_argument(
+            "--out-dir", type=str, default="batch_results",
+            help="Directory for the per-job results and confirmation " +
+            "screenshots (default: batch_results)")
+    add_trace_arg(batch_parser)
+
+    # CATALOG EXPORT SUBCOMMAND
+    catalog_parser = subparsers.add_parser(
+                        "catalog",
+                        help="write every course of the current period " +
+                        "with its status to stdout")
+    catalog_parser.add_argument(
+            "--format", choices=("jsonl", "csv"), default="jsonl",
+            help="One JSON object per line or CSV with a header " +
+            "(default: jsonl)")
+    catalog_parser.add_argument(
+            "--workers", type=int, default=8,
+            help="Number of course pages loaded concurrently (default: 8)")
+    add_cache_args(catalog_parser)
+    add_trace_arg(catalog_parser)
+
+    # CHANGE FEED SUBCOMMAND
+    feed_parser = subparsers.add_parser(
+                        "feed",
+                        help="poll courses and write their status changes " +
+                        "to stdout as JSON lines")
+    add_course_arg(feed_parser, multiple=True)
+    feed_parser.add_argument(
+            "--interval", type=float, default=30, metavar="SECONDS",
+            help="Seconds between polls (default: 30)")
+    feed_parser.add_argument(
+            "--workers", type=int, default=8,
+            help="Number of course pages loaded concurrently (default: 8)")
+    feed_parser.add_argument(
+            "--no-initial", action="store_true",
+            help="Do not report the state of every course on the first " +
+            "poll, only later changes")
+    feed_parser.add_argument(
+            "--once", action="store_true",
+            help="Poll once and exit")
+    add_cache_args(feed_parser)
+    add_trace_arg(feed_parser)
+
+    # DAEMON SUBCOMMAND
+    serve_parser = subparsers.add_parser(
+                        "serve",
+                        help="keep browsers and the course list warm in a " +
+                        "background daemon, which course-status, booking " +
+                        "and watch use automatically")
+    add_socket_arg(serve_parser)
+    add_browser_selection_group(serve_parser)
+    serve_parser.add_argument(
+            "--pool-size", type=int, default=2,
+            help="Number of browser sessions kept warm (default: 2)")
+    serve_parser.add_argument(
+            "--catalog-ttl", type=int, default=300, metavar="SECONDS",
+            help="Seconds after which the course list in memory is " +
+            "revalidated (default: 300)")
+    serve_parser.add_argument(
+            "--no-cache", action="store_true",
+            help="Neither read nor write the local course list cache")
+    serve_parser.add_argument(
+            "--store", type=str, nargs="+", metavar="PATH",
+            help="Credentials stores, files or directories to validate " +
+            "and keep in memory, bookings with their --profile do not " +
+            "read any file")
+    serve_parser.add_argument(
+            "--stop", action="store_true",
+            help="Stop the running daemon")
+
+    # CLOCK SYNC SUBCOMMAND
+    clock_parser = subparsers.add_parser(
+                        "clock-sync",
+                        help="estimate the offset between the local clock " +
+                        "and the booking server's clock")
+    clock_parser.add_argument(
+            "--samples", type=int, default=8,
+            help="Number of requests to sample (default: 8)")
+
+    # WATCH SUBCOMMAND
+    watch_parser = subparsers.add_parser(
+                        "watch",
+                        help="watch a hochschulsport course and book it " +
+                        "as soon as booking is possible")
+    add_credentials_arg(watch_parser)
+    add_course_arg(watch_parser)
+    add_browser_selection_group(
+        watch_parser,
+        http="Watch and book with plain HTTP requests instead of a " +
+        "browser. The confirmation page is saved as HTML.")
+    add_cache_args(watch_parser)
+    watch_parser.add_argument(
+            "--interval", type=float, default=30, metavar="SECONDS",
+            help="Seconds between status checks (default: 30)")
+    watch_parser.add_argument(
+            "--min-interval", type=float, default=0.5, metavar="SECONDS",
+            help="Seconds between status checks close to an opening " +
+            "time (default: 0.5)")
+    watch_parser.add_argument(
+            "--opens-at", type=datetime.fromisoformat, nargs="+",
+            default=[], metavar="DATETIME",
+            help="Known opening times of the registration in ISO format, " +
+            "e.g. 2026-10-20T08:00. Times announced on the course page " +
+            "are picked up automatically.")
+    watch_parser.add_argument(
+            "--window", type=float, default=120, metavar="SECONDS",
+            help="Seconds before and after an opening time in which " +
+            "--min-interval is used (default: 120)")
+    add_trace_arg(watch_parser)
+    add_daemon_args(watch_parser)
+    watch_parser.add_argument(
             "--booking-out", default="confirmation.png",
             action=OutfileAction,
             help="File destination to write a screenshot of the" +
@@ -141,7 +396,19 @@ def parse_args():
 
     if not args.subcommand:
         msg = "No task selected. Choose on of 'check-credentials', " + \
-                "'course-status', 'booking'."
+                "'course-status', 'booking', 'watch', 'batch-book', " + \
+                "'catalog', 'feed', 'clock-sync', 'serve'."
         parser.error(msg)
 
+    if args.subcommand == "course-status" and \
+            not args.course and not args.course_file:
+        parser.error("At least one of --course or --course-file is required")
+
+    if args.subcommand == "booking" and args.hedge is not None and args.at:
+        parser.error("--hedge cannot be combined with --at")
+
+    if args.subcommand == "check-credentials" and \
+            not args.credentials and not args.store:
+        parser.error("One of --credentials or --store is required")
+
     return args
@@ -0,0 +1,92 @@
+import time
+from collections import namedtuple
+from email.utils import parsedate_to_datetime
+from .catalog import CourseCatalog
+from .session import HTTPSession
+from .errors import LoadingFailed
+
+
+SYNC_URL = CourseCatalog.BASE_URL
+
+ClockOffset = namedtuple("ClockOffset", ["offset", "uncertainty", "rtt",
+                                         "samples"])
+ClockOffset.__doc__ = """
+Estimated server clock offset: server time = local time + offset.
+The true offset lies within offset +/- uncertainty (seconds).
+"""
+
+
+class ClockSync:
+    """
+    Estimates the offset between the local clock and the booking server's
+    clock from the HTTP Date headers of several requests.
+
+    The Date header only has a resolution of one second. Every response
+    bounds the offset to [date - received, date + 1 - sent]; the requests
+    are timed so that the server's second ticks over while they are in
+    flight, which halves the remaining interval with every sample until it
+    is about as narrow as the round trip time.
+    """
+
+    def __init__(self, session=None, url=SYNC_URL, samples=8):
+        self._owns_session = session is None
+        self.session = session or HTTPSession()
+        self.url = url
+        self.samples = samples
+
+    def close(self):
+        """
+        Close the HTTP session, if it was opened by this ClockSync
+        """
+        if self._owns_session:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _sample(self):
+        sent = time.time()
+        response = self.session.request("HEAD", self.url)
+        received = time.time()
+        try:
+            date = parsedate_to_datetime(response.headers["date"]).timestamp()
+        except (KeyError, TypeError, ValueError):
+            raise LoadingFailed("No valid Date header from {}".format(self.url))
+        return sent, received, date
+
+    def estimate(self):
+        lower, upper = float("-inf"), float("inf")
+        midpoints = []
+        rtts = []
+
+        for i in range(self.samples):
+            if i > 0 and upper - lower < 1:
+                # send the request such that the server's second boundary,
+                # as estimated so far, lies in the middle of its flight
+                offset = (lower + upper) / 2
+                rtt = min(rtts)
+                now = time.time()
+                tick = int(now + offset + rtt) + 1
+                time.sleep(max(0, tick - offset - rtt / 2 - now))
+
+            sent, received, date = self._sample()
+            rtts.append(received - sent)
+            midpoints.append(date + 0.5 - (sent + received) / 2)
+            lower = max(lower, date - received)
+            upper = min(upper, date + 1 - sent)
+
+        if lower <= upper:
+            offset = (lower + upper) / 2
+            uncertainty = (upper - lower) / 2
+        else:
+            # inconsistent samples, e.g. the server clock was adjusted
+            midpoints.sort()
+            offset = midpoints[len(midpoints) // 2]
+            uncertainty = 0.5 + max(rtts) / 2
+
+        rtts.sort()
+        return ClockOffset(offset, uncertainty, rtts[len(rtts) // 2],
+                           len(rtts))
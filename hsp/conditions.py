@@ -1,20 +1,27 @@
-from selenium.common.exceptions import NoSuchElementException
-import time
+from selenium.common.exceptions import (NoSuchElementException,
+                                        StaleElementReferenceException)
+from . import trace
 
 
-class submit_successful(object):
-    """An expectation for checking if submit was successful,
-    based on the disappearance of a second element.
+class page_changed(object):
+    """An expectation for checking if a submit changed the page,
+    based on the submitted element going stale and the disappearance
+    of a second element from the new page. A page that shows the form
+    again, e.g. with an error notice, does not count. Does not submit
+    anything itself.
     """
-    def __init__(self, submit_locator, observed_locator):
-        self.submit_locator = submit_locator
+    def __init__(self, submitted_element, observed_locator):
+        self.submitted_element = submitted_element
         self.observed_locator = observed_locator
 
     def __call__(self, driver):
-        # submit the element
-        driver.find_element(*self.submit_locator).submit()
-
-        time.sleep(0.1)
+        trace.count("page change checks")
+        try:
+            # any call on an element of a replaced page raises
+            self.submitted_element.is_enabled()
+            return False
+        except StaleElementReferenceException:
+            pass
 
         try:
             _ = driver.find_element(*self.observed_locator)
@@ -0,0 +1,77 @@
+from .lazy import Lazy
+from .errors import InvalidCredentials
+
+
+class Course:
+    """
+    Fields and accessors shared by HSPCourse and HTTPCourse.
+    Subclasses load the course list row in _scrape_course_detail and the
+    course page in _scrape_course_status, each assigning all of its fields,
+    and release their driver or session in close().
+    """
+
+    DETAIL_FIELDS = ("course_page_url", "time", "weekday", "location", "level")
+    STATUS_FIELDS = ("course_name", "booking_possible", "waitinglist_exists",
+                     "course_status")
+
+    course_page_url = Lazy("_scrape_course_detail")
+    time = Lazy("_scrape_course_detail")
+    weekday = Lazy("_scrape_course_detail")
+    location = Lazy("_scrape_course_detail")
+    level = Lazy("_scrape_course_detail")
+
+    course_name = Lazy("_scrape_course_status")
+    booking_possible = Lazy("_scrape_course_status")
+    waitinglist_exists = Lazy("_scrape_course_status")
+    course_status = Lazy("_scrape_course_status")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def info(self):
+        infostr = "#{}: {} {}, {} {}".format(self.course_id or "",
+                                             self.course_name or "",
+                                             self.level or "",
+                                             self.weekday or "",
+                                             self.time or "")
+        return infostr
+
+    def status(self):
+        return "Status: {}".format(self.course_status)
+
+    def is_bookable(self):
+        return self.booking_possible
+
+    def has_waitinglist(self):
+        return self.waitinglist_exists
+
+    def _pass_gate(self, step):
+        """
+        Report a step to the booking_gate of a hedged booking, which raises
+        BookingAborted if another session confirms the booking
+        """
+        if self.booking_gate is not None:
+            self.booking_gate.step(self, step)
+
+    @staticmethod
+    def _personal_values(credentials):
+        """
+        The values of the booking form's personal details, all of them
+        strings, as YAML files may give numbers, e.g. for the zip code
+        """
+        if not credentials or not credentials.is_valid():
+            raise InvalidCredentials("Credentials are invalid")
+
+        return {
+            "gender": str(credentials.gender),
+            "name": str(credentials.name),
+            "surname": str(credentials.surname),
+            "street": "{} {}".format(credentials.street, credentials.number),
+            "city": "{} {}".format(credentials.zip_code, credentials.city),
+            "status": str(credentials.status),
+            "pid": str(credentials.pid),
+            "email": str(credentials.email),
+        }
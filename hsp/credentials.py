@@ -1,6 +1,53 @@
 from .errors import InvalidCredentials
 import json
-import yaml
+import os
+
+
+CREDENTIALS_EXTENSIONS = (".JSON", ".YAML", ".YML")
+
+
+def load_yaml(stream):
+    """
+    Parse YAML with the safe loader, the C implementation if available
+    """
+    import yaml
+
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    return yaml.load(stream, Loader=loader)
+
+
+def load_data(path):
+    """
+    Parse a JSON or YAML file, by its extension.
+    Syntax errors raise InvalidCredentials.
+    """
+    with open(path, "r") as f:
+        if path.upper().endswith(".JSON"):
+            try:
+                return json.load(f)
+            except ValueError as e:
+                raise InvalidCredentials("Invalid JSON: {}".format(e))
+        import yaml
+        try:
+            return load_yaml(f)
+        except yaml.YAMLError as e:
+            raise InvalidCredentials("Invalid YAML: {}".format(e))
+
+
+def _value_error(d, key, missing, numeric=False):
+    """
+    The problem of a credentials value, None if it can be booked with.
+    Numbers are accepted where YAML files may give them unquoted.
+    """
+    value = d.get(key)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return missing
+    if isinstance(value, str):
+        return None
+    if numeric and type(value) is int and value > 0:
+        return None
+    return "'{}' must be {}".format(key, "a positive number or text" if numeric
+                                    else "text")
 
 
 class Credentials:
@@ -30,43 +77,57 @@ class Credentials:
             self.street and self.number and self.zip_code and self.city and \
             self.email and pid_and_status
 
-    @classmethod
-    def from_dict(cls, d):
-        try: name = d["name"]
-        except KeyError: raise InvalidCredentials("No name provided")
-        try: surname = d["surname"]
-        except KeyError: raise InvalidCredentials("No surname provided")
-        try: gender = d["gender"]
-        except KeyError: raise InvalidCredentials("No gender provided")
-        if not gender in ("M", "W"):
-            raise InvalidCredentials("Gender must be one of {'M', 'W'}")
-        try: street = d["street"]
-        except KeyError: raise InvalidCredentials("No street provided")
-        try: number = d["number"]
-        except KeyError: raise InvalidCredentials("No house number provided")
-        try: zip_code = d["zipcode"]
-        except KeyError: raise InvalidCredentials("No zipcode provided")
-        try: city = d["city"]
-        except KeyError: raise InvalidCredentials("No city  provided")
-        try: status = d["status"]
-        except KeyError: raise InvalidCredentials("No status provided")
+    @staticmethod
+    def validate(d):
+        """
+        Returns all problems of a credentials dict, an empty list if it is
+        valid. Values are checked as a booking checks them, so empty values
+        count as missing.
+        """
+        if not isinstance(d, dict):
+            return ["Credentials have to map field names to values"]
+
+        errors = []
+
+        def check(key, missing, numeric=False):
+            error = _value_error(d, key, missing, numeric)
+            if error is not None:
+                errors.append(error)
+
+        check("name", "No name provided")
+        check("surname", "No surname provided")
+        if d.get("gender") is None:
+            errors.append("No gender provided")
+        elif not d["gender"] in ("M", "W"):
+            errors.append("Gender must be one of {'M', 'W'}")
+        check("street", "No street provided")
+        check("number", "No house number provided", numeric=True)
+        check("zipcode", "No zipcode provided", numeric=True)
+        check("city", "No city provided")
         statuses = ("S-UNIT", "S-aH", "B-UNIT", "B-UKT", "B-aH", "Extern")
-        if not status in statuses:
-            raise InvalidCredentials("'status' must be one of {}".format(statuses))
+        if d.get("status") is None:
+            errors.append("No status provided")
+        elif not d["status"] in statuses:
+            errors.append("'status' must be one of {}".format(statuses))
         # external people don't have an employee phone or matriculation number
-        if not status == "Extern":
-            try: pid = d["pid"]
-            except KeyError:
-                raise InvalidCredentials("No matriculation " + \
-                    "number / employee phone number ('pid') provided")
-        else:
-            pid = ""
-        try: email = d["email"]
-        except KeyError: raise InvalidCredentials("No email provided")
+        if d.get("status") != "Extern":
+            check("pid", "No matriculation " + \
+                  "number / employee phone number ('pid') provided",
+                  numeric=True)
+        check("email", "No email provided")
+        return errors
 
-        return cls(name=name, surname=surname, gender=gender, street=street,
-                    number=number, zip_code=zip_code, city=city,
-                    status=status, pid=pid, email=email)
+    @classmethod
+    def from_dict(cls, d):
+        errors = cls.validate(d)
+        if errors:
+            raise InvalidCredentials("; ".join(errors), errors=errors)
+
+        pid = d["pid"] if d["status"] != "Extern" else ""
+        return cls(name=d["name"], surname=d["surname"], gender=d["gender"],
+                    street=d["street"], number=d["number"],
+                    zip_code=d["zipcode"], city=d["city"],
+                    status=d["status"], pid=pid, email=d["email"])
 
     @classmethod
     def from_json(cls, jsonfile):
@@ -77,5 +138,128 @@ class Credentials:
     @classmethod
     def from_yaml(cls, yamlfile):
         with open(yamlfile, "r") as yf:
-            d = yaml.load(yf)
+            d = load_yaml(yf)
             return cls.from_dict(d)
+
+    @classmethod
+    def from_file(cls, credfile):
+        if credfile.upper().endswith(".JSON"):
+            return cls.from_json(credfile)
+        else:  # its a yaml file
+            return cls.from_yaml(credfile)
+
+
+def _is_store(data):
+    if isinstance(data, dict) and isinstance(data.get("profiles"), dict):
+        return True
+    return isinstance(data, dict) and len(data) > 0 and \
+        all(isinstance(value, dict) for value in data.values())
+
+
+def _read_profiles(path):
+    """
+    Reads and validates the profiles of a store or credentials file.
+    Returns (profile, source, credentials dict or None, errors) tuples,
+    a single credentials file is a profile named after the file.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    try:
+        data = load_data(path)
+    except InvalidCredentials as e:
+        return [(name, path, None, [e.msg])]
+    except OSError as e:
+        return [(name, path, None, [str(e)])]
+
+    if not _is_store(data):
+        return [(name, path, data, Credentials.validate(data))]
+
+    profiles = data.get("profiles", data)
+    return [(str(profile), path, d, Credentials.validate(d))
+            for profile, d in profiles.items()]
+
+
+def _credentials_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for entry in sorted(os.listdir(path)):
+                if entry.upper().endswith(CREDENTIALS_EXTENSIONS):
+                    yield os.path.join(path, entry)
+        else:
+            yield path
+
+
+class CredentialsStore:
+    """
+    Named credentials profiles, validated when they are loaded and kept in
+    memory, so a booking does not parse any file.
+    A store file maps profile names to credentials, optionally under a
+    'profiles' key. Any other credentials file is a single profile named
+    after the file. Invalid profiles are kept with all their errors.
+    """
+
+    def __init__(self):
+        self.profiles = {}  # profile -> Credentials
+        self.errors = {}  # profile -> list of errors
+        self.sources = {}  # profile -> file
+
+    def add(self, profile, d, source=None, errors=None):
+        if errors is None:
+            errors = Credentials.validate(d)
+        if profile in self.sources and self.sources[profile] != source:
+            errors = errors + ["Profile is also defined in {}".format(
+                self.sources[profile])]
+        self.sources[profile] = source
+        if errors:
+            self.profiles.pop(profile, None)
+            self.errors[profile] = errors
+        else:
+            self.profiles[profile] = Credentials.from_dict(d)
+            self.errors.pop(profile, None)
+
+    def get(self, profile):
+        if profile in self.profiles:
+            return self.profiles[profile]
+        if profile in self.errors:
+            errors = self.errors[profile]
+            raise InvalidCredentials("Profile {}: {}".format(
+                profile, "; ".join(errors)), errors=errors)
+        raise InvalidCredentials("No profile named {}".format(profile))
+
+    def __contains__(self, profile):
+        return profile in self.sources
+
+    def __len__(self):
+        return len(self.sources)
+
+    def report(self):
+        """
+        One dict per profile, for a machine-readable validation report
+        """
+        return [{"profile": profile,
+                 "source": source,
+                 "valid": profile in self.profiles,
+                 "errors": self.errors.get(profile, [])}
+                for profile, source in sorted(self.sources.items())]
+
+    @classmethod
+    def load(cls, *paths, workers=None):
+        """
+        Reads store and credentials files, and all credentials files in
+        directories. Several files are parsed in parallel processes.
+        """
+        files = list(_credentials_files(paths))
+        if len(files) > 1 and workers != 1:
+            # multiprocessing is slow to import, and not needed for one file
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_read_profiles, files,
+                                            chunksize=8))
+        else:
+            results = [_read_profiles(f) for f in files]
+
+        store = cls()
+        for profiles in results:
+            for profile, source, d, errors in profiles:
+                store.add(profile, d, source, errors)
+        return store
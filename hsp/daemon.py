@@ -0,0 +1,460 @@
+import json
+import os
+import queue
+import select
+import socket
+import socketserver
+import threading
+import time
+from contextlib import contextmanager
+from .cache import default_cache_dir
+from .log import log
+from .errors import DaemonUnavailable, Error, LoadingFailed
+
+
+def default_socket_path():
+    base = os.environ.get("XDG_RUNTIME_DIR") or default_cache_dir()
+    return os.path.join(base, "hsp.sock")
+
+
+class DaemonClient:
+    """
+    Sends requests to a running hsp daemon. Every call opens a connection,
+    writes one JSON request line and reads JSON lines back until the
+    result. Lines with a 'log' message before it are passed to on_log.
+    """
+
+    def __init__(self, socket_path=None, timeout=None):
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+        self.info = None  # the daemon's answer to a ping
+
+    def call(self, op, on_log=None, **params):
+        params["op"] = op
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+        except (AttributeError, OSError) as e:
+            raise DaemonUnavailable(str(e))
+
+        try:
+            sock.sendall((json.dumps(params) + "\n").encode("utf-8"))
+            with sock.makefile("r", encoding="utf-8") as lines:
+                for line in lines:
+                    message = json.loads(line)
+                    if "log" in message:
+                        if on_log is not None:
+                            on_log(message["log"])
+                        continue
+                    if message.get("invalid"):
+                        raise DaemonUnavailable(message["error"])
+                    return message
+        except (OSError, ValueError) as e:
+            raise DaemonUnavailable(str(e))
+        finally:
+            sock.close()
+        raise DaemonUnavailable("Connection closed without a result")
+
+
+def connect(socket_path=None):
+    """
+    Returns a client for the daemon if one is running, otherwise None
+    """
+    socket_path = socket_path or default_socket_path()
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(socket_path):
+        return None
+    client = DaemonClient(socket_path, timeout=2)
+    try:
+        client.info = client.call("ping")
+    except DaemonUnavailable:
+        return None
+    client.timeout = None
+    return client
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def _send(self, message):
+        self.wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def _peer_gone(self):
+        # the client closed its end, e.g. a watch was interrupted
+        readable, _, _ = select.select([self.connection], [], [], 0)
+        if not readable:
+            return False
+        try:
+            return self.connection.recv(1, socket.MSG_PEEK) == b""
+        except OSError:
+            return True
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line.decode("utf-8"))
+            op = getattr(self.server.daemon, "op_" + request.pop("op"))
+        except (ValueError, KeyError, AttributeError, TypeError):
+            self._send({"ok": False, "invalid": True,
+                        "error": "Invalid request"})
+            return
+
+        try:
+            result = op(self, **request)
+        except TypeError as e:
+            result = {"ok": False, "invalid": True,
+                      "error": "Invalid request: {}".format(e)}
+        except Exception as e:
+            # e.g. a crashed webdriver, the daemon keeps serving
+            result = {"ok": False, "error": str(e).strip() or repr(e)}
+        try:
+            self._send(result)
+        except OSError:
+            pass
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+
+class HSPDaemon:
+    """
+    Keeps the parsed course list, warm HTTP connections and a pool of
+    webdrivers in memory and serves status, booking and watch requests on a
+    Unix socket, so repeated CLI calls do not start a browser or load the
+    course list again. The course list is revalidated every 'catalog_ttl'
+    seconds, or when a request asks to refresh it. Status checks use plain
+    HTTP, with the webdrivers as fallback. 'browser' names the browser and
+    profile of the driver_factory, e.g. 'headless_chrome full', for clients
+    to compare with their own.
+    Credentials from 'store' paths are validated once and kept in memory.
+    """
+
+    def __init__(self, socket_path=None, driver_factory=None, pool_size=2,
+                 catalog_ttl=300, use_cache=True, store=None, browser=None):
+        self.socket_path = socket_path or default_socket_path()
+        self.driver_factory = driver_factory
+        self.browser = browser
+        self.pool_size = pool_size
+        self.catalog_ttl = catalog_ttl
+        self.use_cache = use_cache
+        self._catalog = None
+        self._catalog_loaded = 0
+        self._catalog_lock = threading.Lock()
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._idle_sessions = queue.LifoQueue()
+        self._sessions = []
+        self._server = None
+        self.store = None
+        if store:
+            from .credentials import CredentialsStore
+            self.store = CredentialsStore.load(*store)
+
+    # shared state
+
+    @contextmanager
+    def _session(self):
+        """
+        A warm keep-alive session for reading the course list and pages.
+        Bookings use their own sessions, so their cookies are not shared.
+        """
+        from .session import HTTPSession
+
+        try:
+            session = self._idle_sessions.get_nowait()
+        except queue.Empty:
+            session = HTTPSession()
+            self._sessions.append(session)
+        try:
+            yield session
+        finally:
+            self._idle_sessions.put(session)
+
+    def pool(self):
+        from .pool import DriverPool
+
+        with self._pool_lock:
+            if self._pool is None:
+                kwargs = {}
+                if self.driver_factory is not None:
+                    kwargs["factory"] = self.driver_factory
+                self._pool = DriverPool(size=self.pool_size, prestart=False,
+                                        **kwargs)
+            return self._pool
+
+    def catalog(self, refresh=False):
+        from .cache import CourseListCache
+        from .catalog import CourseCatalog
+
+        with self._catalog_lock:
+            if refresh or self._catalog is None or \
+                    time.time() - self._catalog_loaded > self.catalog_ttl:
+                try:
+                    with self._session() as session:
+                        if self.use_cache:
+                            cache = CourseListCache(ttl=self.catalog_ttl)
+                            catalog = cache.load(session, refresh=refresh)
+                        else:
+                            catalog = CourseCatalog.fetch(session)
+                except LoadingFailed:
+                    if self._catalog is not None:
+                        # keep serving the last course list
+                        return self._catalog
+                    with self.pool().driver() as driver:
+                        catalog = CourseCatalog.from_driver(driver)
+                self._catalog = catalog
+                self._catalog_loaded = time.time()
+            return self._catalog
+
+    def _credentials(self, path, profile=None):
+        """
+        Credentials of a request, taken from the store in memory if they
+        were loaded at start, otherwise read from the file
+        """
+        from .credentials import Credentials, CredentialsStore
+
+        if self.store is not None:
+            if profile is None:
+                # a plain credentials file is a profile of its own
+                profiles = [name for name, source in self.store.sources.items()
+                            if os.path.abspath(source) == path]
+                if len(profiles) == 1:
+                    return self.store.get(profiles[0])
+            elif profile in self.store:
+                return self.store.get(profile)
+
+        if profile is None:
+            return Credentials.from_file(path)
+        return CredentialsStore.load(path, workers=1).get(profile)
+
+    def _open_course(self, course_id, engine):
+        """
+        Returns a course and a function releasing its session
+        """
+        from .booking import HSPCourse
+        from .httpcourse import HTTPCourse
+        from .session import HTTPSession
+
+        catalog = self.catalog()
+        if engine in ("http", "auto"):
+            session = HTTPSession()
+            try:
+                course = HTTPCourse(course_id, session, catalog)
+                course.status()  # loads the course page
+                return course, session.close
+            except LoadingFailed:
+                session.close()
+                if engine == "http":
+                    raise
+
+        pool = self.pool()
+        driver = pool.acquire()
+        try:
+            course = HSPCourse(course_id, driver, catalog=catalog)
+            course.status()  # read while the driver is held
+        except BaseException:
+            pool.release(driver)
+            raise
+        return course, lambda: pool.release(driver)
+
+    # operations, called with the request handler and the request fields
+
+    def op_ping(self, handler):
+        return {"ok": True, "pid": os.getpid(), "browser": self.browser,
+                "catalog_loaded": self._catalog_loaded or None}
+
+    def op_shutdown(self, handler):
+        threading.Thread(target=self._server.shutdown, daemon=True).start()
+        return {"ok": True}
+
+    def op_status(self, handler, courses, engine="auto", refresh=False):
+        from .httpcourse import HTTPCourse
+
+        results = []
+        page_cache = {}
+        if refresh:
+            try:
+                self.catalog(refresh=True)
+            except Error:
+                # reported for every course below
+                pass
+        with self._session() as session:
+            for course_id in courses:
+                result = {"course_id": course_id, "info": None,
+                          "status": None, "error": None}
+                try:
+                    if engine == "browser":
+                        course, release = self._open_course(course_id, engine)
+                        release()
+                    else:
+                        try:
+                            course = HTTPCourse(course_id, session,
+                                                self.catalog(), page_cache)
+                            course.status()  # loads the course page
+                        except LoadingFailed:
+                            if engine == "http":
+                                raise
+                            course, release = self._open_course(course_id,
+                                                                "browser")
+                            release()
+                    result["info"] = course.info()
+                    result["status"] = course.status()
+                except Error as e:
+                    result["error"] = e.msg
+                results.append(result)
+        return {"ok": True, "results": results}
+
+    def op_booking(self, handler, course, credentials, profile=None,
+                   confirmation_file=None, engine="auto", refresh=False):
+        from .errors import CourseNotBookable
+
+        result = {"ok": False, "info": None, "status": None, "error": None,
+                  "reason": None}
+        try:
+            credentials = self._credentials(credentials, profile)
+            self.catalog(refresh)
+            hsp_course, release = self._open_course(course, engine)
+        except Error as e:
+            result.update(error=e.msg, reason="failed")
+            return result
+
+        try:
+            result["info"] = hsp_course.info()
+            hsp_course.booking(credentials, confirmation_file)
+            result["ok"] = True
+        except CourseNotBookable as e:
+            result.update(error=e.msg, reason="not bookable")
+        except Error as e:
+            result.update(error=e.msg, reason="failed")
+        finally:
+            result["status"] = hsp_course.status()
+            release()
+        return result
+
+    def op_watch(self, handler, course, credentials, profile=None,
+                 confirmation_file=None, engine="auto", interval=30,
+                 min_interval=0.5, opening_times=(), window=120,
+                 refresh=False):
+        from .watch import CourseWatcher
+
+        result = {"ok": False, "info": None, "error": None, "stopped": False}
+        try:
+            credentials = self._credentials(credentials, profile)
+            self.catalog(refresh)
+            hsp_course, release = self._open_course(course, engine)
+        except Error as e:
+            result["error"] = e.msg
+            return result
+
+        def send_log(msg):
+            try:
+                handler._send({"log": msg})
+            except OSError:
+                watcher.stop()
+
+        outcome = {}
+
+        def run():
+            try:
+                outcome["booked"] = watcher.run(credentials,
+                                                confirmation_file)
+            except Error as e:
+                outcome["error"] = e.msg
+            except Exception as e:
+                # e.g. a crashed webdriver, not a clean stop
+                outcome["error"] = str(e).strip() or repr(e)
+
+        try:
+            watcher = CourseWatcher(hsp_course, interval=interval,
+                                    min_interval=min_interval,
+                                    opening_times=opening_times,
+                                    window=window, logger=send_log)
+            result["info"] = hsp_course.info()
+            thread = threading.Thread(target=run, daemon=True)
+            thread.start()
+            while thread.is_alive():
+                thread.join(0.5)
+                if handler._peer_gone():
+                    watcher.stop()
+        finally:
+            release()
+
+        result["ok"] = outcome.get("booked", False)
+        result["stopped"] = "error" not in outcome and not result["ok"]
+        result["error"] = outcome.get("error")
+        return result
+
+    # server
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self.socket_path):
+            return
+        if connect(self.socket_path) is not None:
+            raise DaemonUnavailable(
+                "Another daemon is running on {}".format(self.socket_path))
+        os.unlink(self.socket_path)
+
+    def serve_forever(self, warm=True):
+        directory = os.path.dirname(self.socket_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._remove_stale_socket()
+
+        # the socket accepts credentials file paths, only the owner may use it
+        umask = os.umask(0o177)
+        try:
+            self._server = _Server(self.socket_path, _Handler)
+        finally:
+            os.umask(umask)
+        self._server.daemon = self
+
+        if warm:
+            self.warm_up()
+        log("Listening on {}".format(self.socket_path))
+        try:
+            self._server.serve_forever()
+        finally:
+            self.close()
+
+    def warm_up(self):
+        """
+        Load the course list and start one webdriver ahead of the first
+        request
+        """
+        from selenium.common.exceptions import WebDriverException
+
+        if self.store is not None:
+            log("{} of {} credentials profiles valid".format(
+                len(self.store.profiles), len(self.store)))
+        try:
+            catalog = self.catalog()
+            log("Course list loaded, {} courses".format(len(catalog)))
+        except Error as e:
+            log("[!] " + e.msg)
+        try:
+            pool = self.pool()
+            pool.release(pool.acquire())
+            log("Webdriver started")
+        except WebDriverException as e:
+            log("[!] No webdriver, only plain HTTP is available: " +
+                str(e).strip().splitlines()[0])
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+
+    def close(self):
+        if self._server is not None:
+            self._server.server_close()
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+        for session in self._sessions:
+            session.close()
+        if self._pool is not None:
+            self._pool.close()
@@ -39,8 +39,21 @@ class CourseHasNoWaitinglist(Error):
 
 class InvalidCredentials(Error):
 
-    def __init__(self, msg):
+    def __init__(self, msg, errors=None):
         self.msg = msg
+        self.errors = errors or [msg]
+
+
+class InvalidManifest(Error):
+
+    def __init__(self, msg):
+        self.msg = "Invalid manifest. " + msg
+
+
+class DaemonUnavailable(Error):
+
+    def __init__(self, msg):
+        self.msg = "The hsp daemon is not available. " + msg
 
 
 class BookingFailed(Error):
@@ -48,6 +61,12 @@ class BookingFailed(Error):
     pass
 
 
+class BookingAborted(Error):
+    """ Another session of a hedged booking sends the confirmation """
+
+    pass
+
+
 class FirefoxBinaryError(Error):
     """ Exception to express an error with the firefox Binary """
 
@@ -0,0 +1,122 @@
+import csv
+import json
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urldefrag
+from .parsing import parse_course_page
+from .session import HTTPSession, ThreadSessions
+from .errors import Error
+
+
+FIELDS = ["course_id", "course_name", "time", "weekday", "location", "level",
+          "course_status", "booking_possible", "waitinglist_exists",
+          "course_page_url", "error"]
+
+
+def _record(row, course_name=None, status=(None, None, None), error=None):
+    course_status, booking_possible, waitinglist_exists = status
+    return {
+        "course_id": row.course_id,
+        "course_name": course_name,
+        "time": row.time,
+        "weekday": row.weekday,
+        "location": row.location,
+        "level": row.level,
+        "course_status": course_status,
+        "booking_possible": booking_possible,
+        "waitinglist_exists": waitinglist_exists,
+        "course_page_url": row.course_page_url,
+        "error": error,
+    }
+
+
+class CatalogExport:
+    """
+    Resolves the status of every course in a CourseCatalog.
+    Courses are grouped by course page, every page is fetched once. At most
+    'workers' pages are loaded at a time, each worker thread keeps its own
+    keep-alive session. Records are yielded as their page is parsed and
+    only 'workers' pages are held in memory, whatever the catalog size.
+    """
+
+    def __init__(self, catalog, workers=8, session_factory=HTTPSession):
+        self.catalog = catalog
+        self.workers = workers
+        self.session_factory = session_factory
+        self._sessions = ThreadSessions(session_factory)
+
+    def _pages(self):
+        pages = OrderedDict()
+        for row in self.catalog:
+            if row.course_page_url:
+                page_url = urldefrag(row.course_page_url)[0]
+                pages.setdefault(page_url, []).append(row)
+            else:
+                pages.setdefault(None, []).append(row)
+        return pages
+
+    def _fetch(self, page_url, rows):
+        try:
+            html = self._sessions.get().get(page_url).text
+            course_name, statuses = parse_course_page(html)
+        except Error as e:
+            return [_record(row, error=e.msg) for row in rows]
+
+        records = []
+        for row in rows:
+            if row.course_id in statuses:
+                records.append(_record(row, course_name,
+                                       statuses[row.course_id]))
+            else:
+                records.append(_record(row, course_name,
+                                       error="Course missing on course page"))
+        return records
+
+    def run(self):
+        """
+        Yields one record dict per course, in the order they are resolved
+        """
+        pages = self._pages()
+        for row in pages.pop(None, ()):
+            yield _record(row, error="No course page listed")
+
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        pending = set()
+        queue = iter(pages.items())
+        try:
+            while True:
+                # keep at most 'workers' pages in flight
+                for page_url, rows in queue:
+                    pending.add(executor.submit(self._fetch, page_url, rows))
+                    if len(pending) >= self.workers:
+                        break
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            self._sessions.close()
+
+
+def write_jsonl(records, out):
+    count = 0
+    for record in records:
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+        count += 1
+    return count
+
+
+def write_csv(records, out):
+    writer = csv.DictWriter(out, fieldnames=FIELDS)
+    writer.writeheader()
+    count = 0
+    for record in records:
+        writer.writerow(record)
+        out.flush()
+        count += 1
+    return count
@@ -0,0 +1,427 @@
+"""
+Local stand-in for the hochschulsport booking site.
+Serves the course list, course pages in every booking state and the
+multi-step booking form, with injectable latency and failures, for tests
+and benchmarks that must not touch the live site.
+"""
+import argparse
+import hashlib
+import html
+import random
+import socket
+import threading
+import time
+import uuid
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qsl, urlsplit
+
+
+BOOKABLE = "bookable"
+WAITINGLIST = "waitinglist"
+
+PERIOD_PATH = "/angebote/aktueller_zeitraum/"
+BOOKING_PATH = "/cgi/anmeldung.fcgi"
+
+STATUSES = ("S-UNIT", "S-aH", "B-UNIT", "B-UKT", "B-aH", "Extern")
+WEEKDAYS = ("Mo", "Di", "Mi", "Do", "Fr", "Sa", "So")
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title></head>
+<body>
+{body}
+</body></html>
+"""
+
+COURSE_LIST_ROW = """<tr>
+<td class="bs_sknr">{id}</td><td class="bs_sdet">{level}</td>
+<td class="bs_stag">{weekday}</td><td class="bs_szeit">{time}</td>
+<td class="bs_sort"><a href="#">{location}</a></td>
+<td class="bs_sbuch"><a href="{page}#K{id}">{sport}</a></td>
+</tr>"""
+
+COURSE_LIST = """<div class="bs_head">Kurssuche</div>
+<form>
+<input type="checkbox" id="bs_anmeldefrei"> anmeldefrei
+<input type="checkbox" id="bs_ausgebucht"> ausgebucht
+</form>
+<table class="bs_kurse"><tbody>
+{rows}
+</tbody></table>"""
+
+COURSE_PAGE_ROW = """<tr>
+<td class="bs_sknr">{id}</td><td class="bs_sdet">{level}</td>
+<td class="bs_stag">{weekday}</td><td class="bs_szeit">{time}</td>
+<td class="bs_sbuch"><a id="K{id}"></a>{button}</td>
+</tr>"""
+
+COURSE_PAGE = """<div class="bs_head">{sport}</div>
+<form action="{booking_path}" method="POST" target="_blank">
+<table class="bs_kurse"><tbody>
+{rows}
+</tbody></table>
+</form>"""
+
+BOOKING_FORM = """<div class="bs_head">{sport} {id}</div>
+{error}
+<form action="{booking_path}" method="POST">
+<input type="hidden" name="fid" value="{fid}">
+<input type="radio" name="sex" value="M"> M
+<input type="radio" name="sex" value="W"> W
+<input type="text" id="BS_F1100" name="vorname" class="bs_form_field">
+<input type="text" id="BS_F1200" name="name" class="bs_form_field">
+<input type="text" id="BS_F1300" name="strasse" class="bs_form_field">
+<input type="text" id="BS_F1400" name="ort" class="bs_form_field">
+<select id="BS_F1600" name="statusorig">
+<option value="">bitte wählen</option>
+{status_options}
+</select>
+<input type="text" id="BS_F1700" name="matnr" class="bs_form_field">
+<input type="text" id="BS_F1700" name="mitnr" class="bs_form_field">
+<input type="text" id="BS_F2000" name="email" class="bs_form_field">
+<input type="checkbox" name="tnbed" value="1"> Teilnahmebedingungen
+<input type="submit" value="weiter zur Buchung">
+</form>"""
+
+CONFIRM_FORM = """<div class="bs_head">{sport} {id}</div>
+<div class="bs_text_red bs_text_big">Bitte prüfen Sie Ihre Angaben</div>
+<form action="{booking_path}" method="POST">
+<input type="hidden" name="fid" value="{fid}">
+<input type="text" class="bs_form_field" name="email_check_{fid}">
+<input type="submit" value="verbindlich buchen">
+</form>"""
+
+TICKET = """<div class="bs_head">Buchungsbestätigung</div>
+<div class="bs_text_big">Kurs {id}: {sport}</div>
+<div>Buchungsnummer {number}</div>"""
+
+
+def make_courses(count, per_page=10, first_id=1000):
+    """
+    Course fixtures in rotating states: bookable, booked out, waiting list
+    and not yet open
+    """
+    states = (BOOKABLE, "ausgebucht", WAITINGLIST, "ab 20.10., 08:00")
+    courses = []
+    for i in range(count):
+        courses.append({
+            "id": str(first_id + i),
+            "sport": "Sport {}".format(i // per_page + 1),
+            "status": states[i % len(states)],
+            "level": "alle",
+            "weekday": WEEKDAYS[i % len(WEEKDAYS)],
+            "time": "{:02d}:00-{:02d}:30".format(8 + i % 12, 9 + i % 12),
+            "location": "Halle {}".format(i % 5 + 1),
+        })
+    return courses
+
+
+class FakeHSPServer:
+    """
+    Threaded HTTP server on localhost imitating the hochschulsport site.
+
+    'latency' and 'failure_rate' are either numbers, applying to every
+    request, or dicts keyed by the request kind ('list', 'page', 'booking',
+    'other'). Failed requests are answered with HTTP 503.
+    """
+
+    def __init__(self, courses=None, host="127.0.0.1", port=0, latency=0.0,
+                 failure_rate=0.0, seed=None):
+        self.courses = {}
+        self.pages = {}
+        for course in (courses if courses is not None else make_courses(10)):
+            self.add_course(course)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.bookings = []
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._fail_next = 0
+        self._forms = {}
+        self._lock = threading.Lock()
+        self._last_modified = formatdate(time.time(), usegmt=True)
+        self._httpd = _Server((host, port), _Handler)
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    @property
+    def course_list_url(self):
+        return self.base_url + PERIOD_PATH + "kurssuche.html"
+
+    def add_course(self, course):
+        course = dict(course)
+        course["id"] = str(course["id"])
+        slug = "".join(c if c.isalnum() else "_" for c in course["sport"])
+        course["page"] = "_{}.html".format(slug)
+        self.courses[course["id"]] = course
+        self.pages.setdefault(course["page"], []).append(course["id"])
+
+    def set_status(self, course_id, status):
+        with self._lock:
+            self.courses[str(course_id)]["status"] = status
+
+    def fail_next(self, count=1):
+        """
+        Answer the next 'count' requests with HTTP 503
+        """
+        with self._lock:
+            self._fail_next += count
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _setting(self, setting, kind):
+        if isinstance(setting, dict):
+            return setting.get(kind, 0)
+        return setting
+
+    def _inject(self, kind):
+        """
+        Delays the request and returns True if it is to fail
+        """
+        delay = self._setting(self.latency, kind)
+        if delay:
+            time.sleep(delay)
+        with self._lock:
+            self.requests += 1
+            if self._fail_next:
+                self._fail_next -= 1
+                return True
+            return self._random.random() < self._setting(self.failure_rate,
+                                                         kind)
+
+    def render_course_list(self):
+        rows = []
+        for course in self.courses.values():
+            rows.append(COURSE_LIST_ROW.format(
+                **{k: html.escape(v) for k, v in course.items()}))
+        return PAGE.format(title="Kurssuche", body=COURSE_LIST.format(
+            rows="\n".join(rows)))
+
+    def _button(self, course):
+        status = course["status"]
+        if status == BOOKABLE:
+            return ('<input type="submit" value="buchen" class="bs_btn_buchen"'
+                    ' name="BS_Kursid_{}">'.format(course["id"]))
+        if status == WAITINGLIST:
+            return ('<input type="submit" value="Warteliste" '
+                    'class="bs_btn_warteliste" name="BS_Kursid_{}">'.format(
+                        course["id"]))
+        return '<span class="bs_btn_ausgebucht">{}</span>'.format(
+            html.escape(status))
+
+    def render_course_page(self, page):
+        course_ids = self.pages.get(page)
+        if not course_ids:
+            return None
+        rows = []
+        for course_id in course_ids:
+            course = self.courses[course_id]
+            values = {k: html.escape(v) for k, v in course.items()}
+            values["button"] = self._button(course)
+            rows.append(COURSE_PAGE_ROW.format(**values))
+        sport = self.courses[course_ids[0]]["sport"]
+        return PAGE.format(title=sport, body=COURSE_PAGE.format(
+            sport=html.escape(sport), booking_path=BOOKING_PATH,
+            rows="\n".join(rows)))
+
+    def _render_booking_form(self, fid, error=""):
+        course = self.courses[self._forms[fid]["course_id"]]
+        options = "\n".join('<option value="{0}">{0}</option>'.format(s)
+                            for s in STATUSES)
+        if error:
+            error = '<div class="bs_text_red">{}</div>'.format(
+                html.escape(error))
+        return PAGE.format(title="Anmeldung", body=BOOKING_FORM.format(
+            sport=html.escape(course["sport"]), id=course["id"], fid=fid,
+            error=error, status_options=options, booking_path=BOOKING_PATH))
+
+    def _render_confirm_form(self, fid):
+        course = self.courses[self._forms[fid]["course_id"]]
+        return PAGE.format(title="Anmeldung", body=CONFIRM_FORM.format(
+            sport=html.escape(course["sport"]), id=course["id"], fid=fid,
+            booking_path=BOOKING_PATH))
+
+    def handle_booking(self, data):
+        """
+        Advances the booking process by one step, returns the next page
+        """
+        with self._lock:
+            for key in data:
+                if key.startswith("BS_Kursid_"):
+                    course_id = key[len("BS_Kursid_"):]
+                    course = self.courses.get(course_id)
+                    if course is None or course["status"] != BOOKABLE:
+                        return None
+                    fid = uuid.uuid4().hex[:12]
+                    self._forms[fid] = {"course_id": course_id, "step": 1}
+                    return self._render_booking_form(fid)
+
+            fid = data.get("fid")
+            form = self._forms.get(fid)
+            if form is None:
+                return None
+
+            if form["step"] == 1:
+                required = ["sex", "vorname", "name", "strasse", "ort",
+                            "statusorig", "email", "tnbed"]
+                if data.get("statusorig", "").startswith("S-"):
+                    required.append("matnr")
+                elif data.get("statusorig", "").startswith("B-"):
+                    required.append("mitnr")
+                missing = [f for f in required if not data.get(f)]
+                if missing:
+                    return self._render_booking_form(
+                        fid, "Fehlende Angaben: " + ", ".join(missing))
+                form.update(step=2, details=data)
+                return self._render_confirm_form(fid)
+
+            if form["step"] == 2:
+                email_check = data.get("email_check_" + fid)
+                if email_check != form["details"]["email"]:
+                    return self._render_confirm_form(fid)
+                self.bookings.append(dict(form["details"],
+                                          course_id=form["course_id"]))
+                form.update(step=3, ticket=len(self.bookings))
+
+            # the ticket is shown again for repeated submissions, without
+            # booking the course again
+            course = self.courses[form["course_id"]]
+            return PAGE.format(title="Bestätigung", body=TICKET.format(
+                id=course["id"], sport=html.escape(course["sport"]),
+                number=form["ticket"]))
+
+
+class _Server(ThreadingHTTPServer):
+
+    # concurrent clients connect at once, with the default backlog of 5
+    # their connections would be dropped and retried a second later
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # headers and body are written separately, without TCP_NODELAY
+        # every response would wait for the client's delayed ACK
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=None, head=False):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _kind(self, path):
+        if path == PERIOD_PATH + "kurssuche.html":
+            return "list"
+        if path.startswith(PERIOD_PATH):
+            return "page"
+        if path == BOOKING_PATH:
+            return "booking"
+        return "other"
+
+    def _get(self, head=False):
+        fake = self.server.fake
+        path = urlsplit(self.path).path
+        kind = self._kind(path)
+        if fake._inject(kind):
+            return self._send(503, b"Service Unavailable", head=head)
+
+        if kind == "list":
+            body = fake.render_course_list().encode("utf-8")
+            etag = '"{}"'.format(hashlib.sha1(body).hexdigest()[:16])
+            headers = {"ETag": etag, "Last-Modified": fake._last_modified}
+            if self.headers.get("If-None-Match") == etag:
+                return self._send(304, headers=headers, head=True)
+            return self._send(200, body, headers, head)
+
+        if kind == "page":
+            page = fake.render_course_page(path[len(PERIOD_PATH):])
+            if page is not None:
+                return self._send(200, page.encode("utf-8"), head=head)
+
+        if path in ("/", PERIOD_PATH):
+            return self._send(200, PAGE.format(title="HSP", body="").encode(
+                "utf-8"), head=head)
+
+        self._send(404, b"Not Found", head=head)
+
+    def do_GET(self):
+        self._get()
+
+    def do_HEAD(self):
+        self._get(head=True)
+
+    def do_POST(self):
+        fake = self.server.fake
+        length = int(self.headers.get("Content-Length") or 0)
+        data = dict(parse_qsl(self.rfile.read(length).decode("utf-8"),
+                              keep_blank_values=True))
+        path = urlsplit(self.path).path
+
+        if fake._inject(self._kind(path)):
+            return self._send(503, b"Service Unavailable")
+        if path != BOOKING_PATH:
+            return self._send(404, b"Not Found")
+
+        page = fake.handle_booking(data)
+        if page is None:
+            return self._send(400, b"Bad Request")
+        self._send(200, page.encode("utf-8"))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m hsp.fakeserver",
+        description="Serve a local stand-in for the hochschulsport site")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--courses", type=int, default=40,
+                        help="Number of fixture courses (default: 40)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Seconds of delay added to every request")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with HTTP 503")
+    args = parser.parse_args()
+
+    server = FakeHSPServer(make_courses(args.courses), port=args.port,
+                           latency=args.latency,
+                           failure_rate=args.failure_rate)
+    print("Serving {}".format(server.course_list_url), flush=True)
+    try:
+        server.start()._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urldefrag
+from .parsing import course_rows, parse_course_row
+from .session import HTTPSession, ThreadSessions
+from .errors import Error
+from . import trace
+
+
+DETAIL_FIELDS = ("time", "weekday", "location", "level")
+STATUS_FIELDS = ("course_status", "booking_possible", "waitinglist_exists")
+
+
+def _fingerprint(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _event(kind, row, changes=None, state=None, error=None):
+    event = OrderedDict()
+    event["time"] = round(time.time(), 3)
+    event["event"] = kind
+    event["course_id"] = row.course_id
+    event["changes"] = changes or {}
+    event["state"] = state
+    event["error"] = error
+    event["course_page_url"] = row.course_page_url
+    return event
+
+
+def _classify(old, new, changes):
+    """
+    Event name for a change of the status fields
+    """
+    if old is None:
+        return "initial"
+    if new["booking_possible"] and not old["booking_possible"]:
+        return "bookable"
+    if new["waitinglist_exists"] and not old["waitinglist_exists"]:
+        return "waitinglist"
+    if any(field in changes for field in STATUS_FIELDS):
+        return "status"
+    return "details"
+
+
+class CourseFeed:
+    """
+    Polls the course pages of many courses with plain HTTP and reports only
+    what changed between polls.
+    Every page is fetched once per poll, however many of the watched courses
+    it lists. A page whose fingerprint did not change is not parsed at all,
+    otherwise only the table rows of courses whose row fingerprint changed
+    are parsed. The cost of a poll beyond the downloads so grows with the
+    number of changes, not the number of courses.
+
+    Events are dicts passed to 'on_event' (and returned by poll()):
+    'initial' with the first state of a course (unless initial=False),
+    'bookable' when the booking button appears, 'waitinglist' when the
+    waiting list opens, 'status' for other status changes, 'details' when
+    time, weekday, location or level change, 'missing' when a course
+    disappears from its page and 'error' when its page fails to load.
+    """
+
+    def __init__(self, catalog, course_ids=None, on_event=None, interval=30,
+                 workers=8, initial=True, session_factory=HTTPSession):
+        self.catalog = catalog
+        self.on_event = on_event
+        self.interval = interval
+        self.workers = workers
+        self.initial = initial
+        self.session_factory = session_factory
+
+        if course_ids is None:
+            self.rows = list(catalog)
+        else:
+            self.rows = [catalog.get(course_id) for course_id in course_ids]
+
+        self.pages = OrderedDict()  # page url -> rows of watched courses
+        for row in self.rows:
+            if row.course_page_url:
+                page_url = urldefrag(row.course_page_url)[0]
+                self.pages.setdefault(page_url, []).append(row)
+
+        self._page_fingerprints = {}
+        self._row_fingerprints = {}
+        self._states = {}   # course id -> dict of DETAIL_ and STATUS_FIELDS
+        self._errors = {}   # course id -> last reported error
+        self._sessions = ThreadSessions(session_factory)
+        self._executor = None
+        self._stopped = threading.Event()
+
+    def _fetch(self, page_url):
+        try:
+            return self._sessions.get().get(page_url).text, None
+        except Error as e:
+            return None, e.msg
+
+    def _page_events(self, page_url, html, error):
+        rows = self.pages[page_url]
+        if error is not None:
+            events = []
+            for row in rows:
+                if self._errors.get(row.course_id) != error:
+                    self._errors[row.course_id] = error
+                    events.append(_event("error", row,
+                                         state=self._states.get(row.course_id),
+                                         error=error))
+            return events
+
+        fingerprint = _fingerprint(html)
+        if self._page_fingerprints.get(page_url) == fingerprint:
+            for row in rows:
+                self._errors.pop(row.course_id, None)
+            return []
+        self._page_fingerprints[page_url] = fingerprint
+        trace.count("changed pages")
+
+        regions = course_rows(html)
+        events = []
+        for row in rows:
+            self._errors.pop(row.course_id, None)
+            region = regions.get(row.course_id)
+            fingerprint = None if region is None else _fingerprint(region)
+            if self._row_fingerprints.get(row.course_id, False) == fingerprint:
+                continue
+            self._row_fingerprints[row.course_id] = fingerprint
+            trace.count("changed rows")
+
+            fields = None if region is None else \
+                parse_course_row(region, row.course_id)
+            if fields is None:
+                self._states.pop(row.course_id, None)
+                events.append(_event("missing", row,
+                                     error="Course missing on course page"))
+                continue
+
+            # the course page may not list all details of the course list
+            for field in DETAIL_FIELDS:
+                if fields[field] is None:
+                    fields[field] = getattr(row, field)
+
+            old = self._states.get(row.course_id)
+            self._states[row.course_id] = fields
+            changes = OrderedDict(
+                (field, [None if old is None else old[field], fields[field]])
+                for field in DETAIL_FIELDS + STATUS_FIELDS
+                if old is None or old[field] != fields[field])
+            if not changes or (old is None and not self.initial):
+                continue
+            if old is not None and \
+                    any(field in changes for field in STATUS_FIELDS) and \
+                    any(field in changes for field in DETAIL_FIELDS):
+                # a status and a details event
+                details = OrderedDict((field, changes.pop(field))
+                                      for field in DETAIL_FIELDS
+                                      if field in changes)
+                events.append(_event("details", row, details, fields))
+            events.append(_event(_classify(old, fields, changes), row,
+                                 changes, fields))
+        return events
+
+    def poll(self):
+        """
+        Loads every watched course page once and returns the change events,
+        after passing each of them to on_event
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+
+        events = []
+        with trace.span("poll", pages=len(self.pages)):
+            pages = list(self.pages)
+            for page_url, (html, error) in zip(
+                    pages, self._executor.map(self._fetch, pages)):
+                events.extend(self._page_events(page_url, html, error))
+
+        for row in self.rows:
+            if not row.course_page_url and row.course_id not in self._errors:
+                self._errors[row.course_id] = "No course page listed"
+                events.insert(0, _event("error", row,
+                                        error="No course page listed"))
+
+        if self.on_event is not None:
+            for event in events:
+                self.on_event(event)
+        return events
+
+    def run(self):
+        """
+        Polls every 'interval' seconds until stop() is called
+        """
+        while not self._stopped.is_set():
+            started = time.monotonic()
+            self.poll()
+            self._stopped.wait(max(0, self.interval -
+                                   (time.monotonic() - started)))
+
+    def stop(self):
+        self._stopped.set()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._sessions.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def jsonl_writer(out):
+    """
+    An on_event callback writing each event as one JSON line to 'out'
+    """
+    def write(event):
+        out.write(json.dumps(event) + "\n")
+        out.flush()
+    return write
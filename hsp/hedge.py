@@ -0,0 +1,165 @@
+import queue
+import threading
+import time
+from .log import log
+from .errors import (BookingAborted, BookingFailed, CourseIdAmbiguous,
+                     CourseIdNotListed, CourseNotBookable, Error,
+                     InvalidCredentials)
+
+
+class BookingGate:
+    """
+    Shared by the sessions of a hedged booking, which report every step of
+    their booking to it. The first session to reach the 'confirm' step is
+    the only one allowed to send the confirmation, any other session is
+    aborted at its next step, so the course is booked at most once.
+    """
+
+    CONFIRM = "confirm"
+
+    def __init__(self):
+        self.owner = None
+        self.closed = False
+        self.last_progress = time.monotonic()
+        self._lock = threading.Lock()
+
+    def step(self, course, name):
+        with self._lock:
+            if self.closed or \
+                    (self.owner is not None and self.owner is not course):
+                raise BookingAborted("Another session confirms the booking")
+            if name == self.CONFIRM:
+                self.owner = course
+            self.last_progress = time.monotonic()
+
+    def close(self):
+        """
+        Abort every session at its next step
+        """
+        with self._lock:
+            self.closed = True
+
+
+class HedgedBooking:
+    """
+    Books a course with up to 'sessions' independent sessions, to get past
+    stalled requests of an overloaded server. The first session starts at
+    once, another one whenever no session made progress for 'delay' seconds
+    or a session failed before the confirmation. All sessions share a
+    BookingGate, the first one to reach the confirmation wins.
+
+    'open_course' is called for every session and returns a course
+    (HSPCourse or HTTPCourse) with its own webdriver or HTTP session and a
+    function releasing it.
+    """
+
+    def __init__(self, open_course, credentials, delay=5, sessions=2,
+                 logger=log):
+        self.open_course = open_course
+        self.credentials = credentials
+        self.delay = delay
+        self.sessions = sessions
+        self.logger = logger
+        self.gate = BookingGate()
+        self._results = queue.Queue()
+        self._threads = []
+
+    def _book(self, number, confirmation_file):
+        try:
+            course, release = self.open_course()
+        except Error as e:
+            self._results.put((number, None, e))
+            return
+        except Exception as e:
+            # e.g. no webdriver could be started
+            self._results.put((number, None,
+                               BookingFailed(str(e).strip() or repr(e))))
+            return
+
+        try:
+            course.booking_gate = self.gate
+            course.booking(self.credentials, confirmation_file)
+            self._results.put((number, course, None))
+        except Error as e:
+            self._results.put((number, course, e))
+        except Exception as e:
+            # e.g. a crashed webdriver
+            self._results.put((number, course,
+                               BookingFailed(str(e).strip() or repr(e))))
+        finally:
+            release()
+
+    def _start(self, confirmation_file):
+        number = len(self._threads) + 1
+        if number > 1:
+            self.logger("Starting session {} of {}".format(number,
+                                                           self.sessions))
+        # the new session gets the full delay to make progress
+        self.gate.last_progress = time.monotonic()
+        thread = threading.Thread(target=self._book, daemon=True,
+                                  args=(number, confirmation_file))
+        self._threads.append(thread)
+        thread.start()
+
+    def run(self, confirmation_file=None):
+        """
+        Returns the course of the session that booked. Raises the error of
+        the session that sent the confirmation if it failed, or the last
+        error if no session got that far. Sessions still running are
+        aborted, close() waits for them to release their sessions.
+        """
+        try:
+            return self._run(confirmation_file)
+        finally:
+            self.gate.close()
+
+    def _run(self, confirmation_file):
+        self._start(confirmation_file)
+        running = 1
+        error = None
+        while True:
+            try:
+                number, course, result = self._results.get(timeout=0.1)
+            except queue.Empty:
+                if len(self._threads) < self.sessions and \
+                        self.gate.owner is None and \
+                        time.monotonic() - self.gate.last_progress >= \
+                        self.delay:
+                    self._start(confirmation_file)
+                    running += 1
+                continue
+
+            running -= 1
+            if result is None:
+                return course
+            if course is not None and course is self.gate.owner:
+                # the confirmation may have been sent, it is not repeated
+                raise result
+            if isinstance(result, (CourseIdNotListed, CourseIdAmbiguous,
+                                   CourseNotBookable, InvalidCredentials)):
+                # the other sessions would fail the same way
+                raise result
+            if not isinstance(result, BookingAborted):
+                self.logger("[!] Session {}: {}".format(number, result.msg))
+                error = result
+
+            if self.gate.owner is None and \
+                    len(self._threads) < self.sessions:
+                self._start(confirmation_file)
+                running += 1
+            elif running == 0:
+                raise error or BookingFailed("All sessions were aborted")
+
+    def close(self, timeout=None):
+        """
+        Wait until all sessions are released
+        """
+        self.gate.close()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
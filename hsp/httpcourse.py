@@ -0,0 +1,287 @@
+import time
+from urllib.parse import urldefrag, urlencode
+from .session import HTTPSession
+from .catalog import CourseCatalog
+from .course import Course
+from .lazy import forget
+from .parsing import parse_course_page, parse_forms
+from .errors import BookingFailed, CourseNotBookable, LoadingFailed
+from . import trace
+
+
+class HTTPCourse(Course):
+    """
+    Browserless counterpart of HSPCourse.
+    The course list and course page are fetched with a plain keep-alive
+    HTTP session and parsed without rendering, exposing the same fields.
+    Courses sharing a page_cache dict parse every course page only once.
+    Booking replays the form POSTs of the booking process directly.
+    As in HSPCourse, fields are loaded on first access and a booking reuses
+    the course page the status was read from while it is fresh.
+    """
+
+    def __init__(self, course_id, session=None, catalog=None, page_cache=None):
+        self._owns_session = session is None
+        self.session = session or HTTPSession()
+        self.catalog = catalog
+        self.page_cache = page_cache
+        self.page_max_age = 30  # seconds a loaded course page is reused
+        self.booking_gate = None  # shared by the sessions of a hedged booking
+        self.course_id = str(course_id)
+        if catalog is not None:
+            self._scrape_course_detail()
+
+        self._page = None  # (html, load time) of the course page
+        self._booking_page = None
+
+    def _scrape_course_detail(self):
+
+        if self.catalog is None:
+            self.catalog = CourseCatalog.fetch(self.session)
+        row = self.catalog.get(self.course_id)
+
+        self.time = row.time
+        self.weekday = row.weekday
+        self.location = row.location
+        self.level = row.level
+        self.course_page_url = row.course_page_url
+
+    def _scrape_course_status(self):
+
+        page_url = urldefrag(self.course_page_url)[0]
+        if self.page_cache is not None and page_url in self.page_cache:
+            page = self.page_cache[page_url]
+        else:
+            with trace.span("load course page", course=self.course_id):
+                html = self.session.get(page_url).text
+            self._page = (html, time.monotonic())
+            page = parse_course_page(html)
+            if self.page_cache is not None:
+                self.page_cache[page_url] = page
+
+        course_name, statuses = page
+        try:
+            status = statuses[self.course_id]
+        except KeyError:
+            raise LoadingFailed("Course {} missing on course page {}".format(
+                self.course_id, self.course_page_url))
+
+        # assigned only once the page was read
+        self.course_name = course_name
+        (self.course_status,
+         self.booking_possible,
+         self.waitinglist_exists) = status
+
+    def refresh(self, detail=False):
+        """
+        Forget the loaded status, and with detail=True the course list row,
+        so they are loaded again on the next access
+        """
+        if self.page_cache is not None:
+            self.page_cache.pop(urldefrag(self.course_page_url)[0], None)
+        forget(self, *self.STATUS_FIELDS)
+        if detail:
+            forget(self, *self.DETAIL_FIELDS)
+        self._page = None
+
+    def refresh_status(self):
+        """
+        Reload the course page and update the booking status. If the page
+        cannot be read, LoadingFailed is raised and the previous status kept.
+        """
+        if self.page_cache is not None:
+            self.page_cache.pop(urldefrag(self.course_page_url)[0], None)
+        self._page = None
+        self._scrape_course_status()
+
+    def close(self):
+        """
+        Close the HTTP session, if it was opened by this course
+        """
+        if self._owns_session:
+            self.session.close()
+
+    def _submit(self, form, data):
+        if form.method == "POST":
+            return self.session.post(form.action, data)
+        return self.session.get(form.action + "?" + urlencode(data))
+
+    def _switch_to_booking_page(self):
+
+        if self.has_waitinglist() or not self.is_bookable():
+            raise CourseNotBookable(self.course_id, self.status())
+
+        # the course page the status was read from, unless it is too old
+        page_url = urldefrag(self.course_page_url)[0]
+        if self._page is not None and \
+                time.monotonic() - self._page[1] <= self.page_max_age:
+            html = self._page[0]
+        else:
+            html = self.session.get(page_url).text
+        page = parse_forms(html, page_url)
+
+        # the booking button follows the course's anchor inside a form
+        anchor_id = "K" + self.course_id
+        for form in page.forms:
+            button = form.following(anchor_id)
+            if button is not None:
+                break
+        else:
+            raise CourseNotBookable(self.course_id, self.status())
+
+        if "bs_btn_buchen" not in (button.get("class") or ""):
+            raise CourseNotBookable(self.course_id, self.status())
+
+        data = form.values()
+        if button.get("name"):
+            data.append((button["name"], button.get("value", "")))
+
+        response = self._submit(form, data)
+        self._booking_page = response.url
+        return parse_forms(response.text, response.url)
+
+    @staticmethod
+    def _bp_find_form(page, **attrs):
+        for form in page.forms:
+            if form.find(**attrs) is not None:
+                return form
+        return None
+
+    @staticmethod
+    def _bp_set(data, control, value, what):
+        if control is None or not control.get("name"):
+            raise BookingFailed("Booking form has no {} field".format(what))
+        data[:] = [(k, v) for k, v in data if k != control["name"]]
+        data.append((control["name"], value))
+
+    def _bp_enter_personal_details(self, page, credentials):
+
+        values = self._personal_values(credentials)
+        form = self._bp_find_form(page, name="tnbed")
+        if form is None:
+            raise BookingFailed("Booking form not found")
+
+        data = form.values()
+        find = form.find
+
+        # gender radio select
+        self._bp_set(data, find(name="sex", value=values["gender"]),
+                     values["gender"], "gender")
+
+        self._bp_set(data, find(id="BS_F1100", name="vorname"),
+                     values["name"], "name")
+        self._bp_set(data, find(id="BS_F1200", name="name"),
+                     values["surname"], "surname")
+        self._bp_set(data, find(id="BS_F1300", name="strasse"),
+                     values["street"], "street")
+        self._bp_set(data, find(id="BS_F1400", name="ort"),
+                     values["city"], "city")
+
+        # status dropdown and matriculation number / employee phone
+        status = find(id="BS_F1600")
+        if status is None or values["status"] not in \
+                [v for v, _ in status.get("options", ())]:
+            raise BookingFailed("Status {} not selectable".format(
+                values["status"]))
+        self._bp_set(data, status, values["status"], "status")
+        # student status
+        if values["status"] in ("S-UNIT", "S-aH"):
+            self._bp_set(data, find(id="BS_F1700", name="matnr"),
+                         values["pid"], "matriculation number")
+        # employee status
+        elif values["status"] in ("B-UNIT", "B-UKT", "B-aH"):
+            self._bp_set(data, find(id="BS_F1700", name="mitnr"),
+                         values["pid"], "employee phone")
+
+        self._bp_set(data, find(id="BS_F2000", name="email"),
+                     values["email"], "email")
+
+        # agree to EULA
+        eula = find(name="tnbed")
+        self._bp_set(data, eula, eula.get("value") or "on", "EULA")
+
+        submit = find(type="submit", value="weiter zur Buchung")
+        if submit is not None and submit.get("name"):
+            data.append((submit["name"], submit["value"]))
+
+        return form, data
+
+    def _bp_wait_until_submit(self, form, data):
+        """
+        Submits the personal data. The page has changed, if the EULA
+        checkbox is gone.
+        """
+        response = self._submit(form, data)
+        page = parse_forms(response.text, response.url)
+        if self._bp_find_form(page, type="checkbox", name="tnbed"):
+            raise BookingFailed("Personal details were not accepted")
+        return page
+
+    def _bp_enter_confirm_email(self, page, email):
+
+        for form in page.forms:
+            data = form.values()
+            for control in form.controls:
+                if "email_check_" in (control.get("name") or "") and \
+                        "bs_form_field" in (control.get("class") or ""):
+                    self._bp_set(data, control, email, "confirm email")
+            submit = next((c for c in form.controls
+                           if c.get("type") == "submit" and
+                           "buchen" in (c.get("value") or "")), None)
+            if submit is not None:
+                if submit.get("name"):
+                    data.append((submit["name"], submit["value"]))
+                return form, data
+
+        raise BookingFailed("Confirmation form not found")
+
+    def _bp_wait_until_confirm(self, form, data):
+        """
+        Confirms the booking. It succeeded, if the ticket is loaded, which
+        no longer shows the red notice of the confirmation page.
+        """
+        response = self._submit(form, data)
+        page = parse_forms(response.text, response.url)
+        if page.has_element("div", "bs_text_red", "bs_text_big"):
+            raise BookingFailed("Booking was not confirmed")
+        return response
+
+    def _save_confirmation(self, response, outfile):
+
+        if outfile is None:
+            outfile = "booking_confirmation_{}.html".format(self.course_id)
+        elif outfile.lower().endswith(".png"):
+            # there is no rendering to take a screenshot of
+            outfile = outfile[:-4] + ".html"
+
+        with open(outfile, "wb") as of:
+            of.write(response.content)
+        print("[*] Booking ticket saved to {}".format(outfile))
+
+    def booking(self, credentials, confirmation_file=None):
+
+        with trace.span("booking", course=self.course_id):
+            self._pass_gate("open booking page")
+            with trace.span("open booking page"):
+                page = self._switch_to_booking_page()
+
+            # verify and fill in the personal data
+            form, data = self._bp_enter_personal_details(page, credentials)
+
+            # submit the inputs, which leads to the confirmation page
+            self._pass_gate("submit personal details")
+            with trace.span("submit personal details"):
+                page = self._bp_wait_until_submit(form, data)
+
+            # fill in confirm email field, if it exists
+            form, data = self._bp_enter_confirm_email(
+                page, str(credentials.email))
+
+            # confirm, which leads to the ticket, in a hedged booking only
+            # one session gets past the gate
+            self._pass_gate("confirm")
+            with trace.span("confirm booking"):
+                response = self._bp_wait_until_confirm(form, data)
+
+            with trace.span("save confirmation"):
+                self._save_confirmation(response, confirmation_file)
@@ -0,0 +1,36 @@
+class Lazy:
+    """
+    A scraped attribute, loaded on first access by calling the named loader
+    method, which assigns it (and usually its siblings). forget() makes the
+    next access load it again.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.key = "_scraped_" + name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        if self.key not in obj.__dict__:
+            getattr(obj, self.loader)()
+        try:
+            return obj.__dict__[self.key]
+        except KeyError:
+            raise AttributeError("{} was not loaded by {}".format(
+                self.name, self.loader))
+
+    def __set__(self, obj, value):
+        obj.__dict__[self.key] = value
+
+
+def is_loaded(obj, name):
+    return "_scraped_" + name in obj.__dict__
+
+
+def forget(obj, *names):
+    for name in names:
+        obj.__dict__.pop("_scraped_" + name, None)
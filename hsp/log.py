@@ -0,0 +1,9 @@
+from datetime import datetime
+
+
+def log(msg):
+    """
+    Print a message prefixed with the current time in milliseconds
+    """
+    print("[{}] {}".format(datetime.now().strftime("%H:%M:%S.%f")[:-3], msg),
+          flush=True)
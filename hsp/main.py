@@ -1,61 +1,663 @@
+import functools
+import json
+import os
+import sys
+import time
 from .credentials import Credentials
 from .cli import parse_args
-from .booking import (HSPCourse, start_firefox, start_headless_firefox,
-                      start_chrome, start_headless_chrome)
-from .errors import (InvalidCredentials, CourseNotBookable, CourseIdNotListed)
+from . import trace
+from .errors import (InvalidCredentials, BookingFailed, CourseNotBookable,
+                     CourseIdNotListed, CourseIdAmbiguous, DaemonUnavailable,
+                     InvalidManifest, LoadingFailed)
 
 
-def parse_credentials(credfile):
-    if credfile.upper().endswith(".JSON"):
-        credentials = Credentials.from_json(credfile)
-    else:  # its a yaml file
-        credentials = Credentials.from_yaml(credfile)
-    return credentials
+def parse_credentials(credfile, profile=None):
+    if profile is None:
+        return Credentials.from_file(credfile)
+    from .credentials import CredentialsStore
+    return CredentialsStore.load(credfile, workers=1).get(profile)
 
 
-def main():
+def check_credentials_store(args):
+    """
+    Validates all profiles of the given stores, files and directories and
+    reports every error of every profile
+    """
+    from .credentials import CredentialsStore
 
-    args = parse_args()
+    # stdout may be reserved for the report
+    out = sys.stderr if args.report == "-" else sys.stdout
+    print("[*] HSP Credential-Store Checking", file=out, flush=True)
+    started = time.time()
+    store = CredentialsStore.load(*args.store, workers=args.workers)
+    report = store.report()
+    for entry in report:
+        if entry["valid"]:
+            print("... {}: O.K.".format(entry["profile"]), file=out)
+        else:
+            for error in entry["errors"]:
+                print("[!] {}: {}".format(entry["profile"], error), file=out)
+    valid = sum(entry["valid"] for entry in report)
+    print("[*] {} of {} profiles valid ({:.2f}s)".format(
+        valid, len(report), time.time() - started), file=out)
+
+    if args.report == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    elif args.report:
+        with open(args.report, "w") as rf:
+            json.dump(report, rf, indent=2)
+    if valid < len(report):
+        exit(1)
+
+
+# Only the code paths that need them import selenium and the HTTP client,
+# so parsing arguments and checking credentials stay fast.
+
+def driver_factory(args):
+    from . import booking
+
+    if args.use_firefox:
+        start = booking.start_firefox
+    elif args.use_headless_firefox:
+        start = booking.start_headless_firefox
+    elif args.use_chrome:
+        start = booking.start_chrome
+    else:
+        start = booking.start_headless_chrome
+    return functools.partial(start, lean=args.browser_profile == "lean")
+
+
+def start_driver(args):
+    with trace.span("start driver"):
+        return trace.instrument(driver_factory(args)())
+
+
+def browser_selected(args):
+    return args.use_firefox or args.use_headless_firefox or \
+        args.use_chrome or args.use_headless_chrome
+
+
+def browser_setup(args):
+    """
+    The browser and profile driver_factory starts, e.g. 'headless_chrome full'
+    """
+    for browser in ("firefox", "headless_firefox", "chrome"):
+        if getattr(args, "use_" + browser):
+            break
+    else:
+        browser = "headless_chrome"
+    return "{} {}".format(browser, args.browser_profile)
+
+
+def load_catalog(args, session=None, driver=None):
+    """
+    Loads the course list from the local cache, revalidating it over HTTP
+    if it expired. Only without cache or HTTP access the driver is used.
+    """
+    from .cache import CourseListCache
+    from .catalog import CourseCatalog
+
+    with trace.span("load catalog"):
+        if not args.no_cache:
+            cache = CourseListCache(ttl=args.cache_ttl)
+            try:
+                return cache.load(session, refresh=args.refresh)
+            except LoadingFailed:
+                if driver is None:
+                    raise
+        if driver is not None:
+            return CourseCatalog.from_driver(driver)
+        return CourseCatalog.fetch(session)
+
+
+def read_course_ids(args):
+    """
+    The IDs of --course and the first column of each line of --course-file,
+    which may be a CSV file written by 'hsp catalog'
+    """
+    course_ids = list(args.course)
+    if args.course_file:
+        with open(args.course_file, "r") as cf:
+            for line in cf:
+                fields = line.split("#", 1)[0].replace(",", " ").split()
+                course_id = fields[0].strip('"') if fields else None
+                # skips the header of a CSV file
+                if course_id and course_id != "course_id":
+                    course_ids.append(course_id)
+    # drop duplicates, but keep the order
+    return list(dict.fromkeys(course_ids))
+
+
+def print_course_status(course_id, make_course):
+    """
+    Prints the status of a course as soon as it is resolved.
+    Returns False if the course could not be resolved.
+    """
+    try:
+        course = make_course(course_id)
+    except (CourseIdNotListed, CourseIdAmbiguous) as e:
+        print("[ERROR] " + e.msg, flush=True)
+        return False
+    print("... " + course.info())
+    print("... " + course.status(), flush=True)
+    return True
+
+
+def course_status(args):
+    from .httpcourse import HTTPCourse
+    from .session import HTTPSession
+
+    print("[*] HSP Course Status", flush=True)
+
+    course_ids = read_course_ids(args)
+    done = 0
+    ok = True
+
+    if not browser_selected(args):
+        # fast path: one plain HTTP session and one course list load
+        # for all courses, the browser is only a fallback
+        try:
+            with HTTPSession() as session:
+                catalog = load_catalog(args, session=session)
+                page_cache = {}
+                for course_id in course_ids:
+                    ok &= print_course_status(
+                        course_id,
+                        lambda c: HTTPCourse(c, session, catalog, page_cache))
+                    done += 1
+        except LoadingFailed as e:
+            if args.use_http:
+                print("[ERROR] " + e.msg)
+                exit(1)
+            print("[!] " + e.msg)
+            print("... Falling back to a headless chrome session")
+
+    if done < len(course_ids):
+        from .booking import HSPCourse
+
+        driver = start_driver(args)
+        try:
+            catalog = load_catalog(args, driver=driver)
+            for course_id in course_ids[done:]:
+                ok &= print_course_status(
+                    course_id, lambda c: HSPCourse(c, driver, catalog=catalog))
+        finally:
+            driver.quit()
+
+    if not ok:
+        exit(1)
+
+
+def batch_book(args):
+    from .batch import BatchBooking, load_manifest
+    from .catalog import CourseCatalog
+    from .pool import DriverPool
+    from .session import HTTPSession
+
+    print("[*] HSP Batch Booking", flush=True)
+    try:
+        jobs = load_manifest(args.manifest)
+    except InvalidManifest as e:
+        print("[ERROR] " + e.msg)
+        exit(1)
+    workers = max(1, min(args.workers, len(jobs)))
+    print("... {} jobs, {} workers".format(len(jobs), workers), flush=True)
+
+    results = []
+    with DriverPool(size=workers, factory=driver_factory(args)) as pool:
+        try:
+            with HTTPSession() as session:
+                catalog = load_catalog(args, session=session)
+        except LoadingFailed:
+            with pool.driver() as driver:
+                catalog = CourseCatalog.from_driver(driver)
+        batch = BatchBooking(jobs, pool, catalog, out_dir=args.out_dir,
+                             workers=workers, job_timeout=args.job_timeout)
+
+        os.makedirs(args.out_dir, exist_ok=True)
+        results_file = os.path.join(args.out_dir, "results.jsonl")
+        started = time.time()
+        with open(results_file, "w") as rf:
+            for result in batch.run():
+                results.append(result)
+                rf.write(json.dumps(result) + "\n")
+                rf.flush()
+                print("... {}: {} ({:.2f}s){}".format(
+                    result["job"], result["status"], result["latency"] or 0,
+                    " - " + result["error"] if result["error"] else ""),
+                    flush=True)
+        elapsed = time.time() - started
+
+    summary = BatchBooking.summary(results, elapsed)
+    with open(os.path.join(args.out_dir, "summary.json"), "w") as sf:
+        json.dump(summary, sf, indent=2)
+
+    print("[*] {} jobs in {:.2f}s, {:.2f} jobs/s".format(
+        summary["jobs"], elapsed, summary["throughput"] or 0))
+    print("... " + ", ".join("{}: {}".format(status, count)
+                             for status, count in summary["statuses"].items()))
+    if summary["latency_p50"] is not None:
+        print("... latency p50 {:.2f}s, p90 {:.2f}s, p99 {:.2f}s, "
+              "max {:.2f}s".format(summary["latency_p50"],
+                                   summary["latency_p90"],
+                                   summary["latency_p99"],
+                                   summary["latency_max"]))
+
+
+def close_stdout():
+    """
+    Points stdout to devnull after its reader exited, so that flushing it
+    on exit does not raise BrokenPipeError again
+    """
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+
+
+def export_catalog(args):
+    from .export import CatalogExport, write_csv, write_jsonl
+    from .session import HTTPSession
+
+    # stdout is reserved for the records
+    print("[*] HSP Catalog Export", file=sys.stderr, flush=True)
+    started = time.time()
+    try:
+        with HTTPSession() as session:
+            catalog = load_catalog(args, session=session)
+        print("... {} courses".format(len(catalog)), file=sys.stderr,
+              flush=True)
+
+        export = CatalogExport(catalog, workers=max(1, args.workers))
+        write = write_csv if args.format == "csv" else write_jsonl
+        records = export.run()
+        count = write(records, sys.stdout)
+    except LoadingFailed as e:
+        print("[ERROR] " + e.msg, file=sys.stderr)
+        exit(1)
+    except BrokenPipeError:
+        # the reader exited early, e.g. head
+        records.close()
+        close_stdout()
+        exit(0)
+    print("[*] {} courses in {:.2f}s".format(count, time.time() - started),
+          file=sys.stderr)
+
+
+def course_feed(args):
+    from .feed import CourseFeed, jsonl_writer
+    from .session import HTTPSession
+
+    # stdout is reserved for the events
+    print("[*] HSP Course Feed", file=sys.stderr, flush=True)
+    try:
+        with HTTPSession() as session:
+            catalog = load_catalog(args, session=session)
+        course_ids = read_course_ids(args) or None
+        feed = CourseFeed(catalog, course_ids,
+                          on_event=jsonl_writer(sys.stdout),
+                          interval=args.interval,
+                          workers=max(1, args.workers),
+                          initial=not args.no_initial)
+    except (CourseIdNotListed, CourseIdAmbiguous, LoadingFailed) as e:
+        print("[ERROR] " + e.msg, file=sys.stderr)
+        exit(1)
+    print("... Watching {} courses on {} pages".format(
+        len(feed.rows), len(feed.pages)), file=sys.stderr, flush=True)
+
+    with feed:
+        try:
+            if args.once:
+                feed.poll()
+            else:
+                feed.run()
+        except KeyboardInterrupt:
+            print("[!] Feed stopped", file=sys.stderr)
+        except BrokenPipeError:
+            # the reader exited, e.g. head
+            close_stdout()
+
+
+def open_course(args):
+    """
+    Returns the course to book or watch, either with plain HTTP requests
+    or a webdriver, and a function to release the session.
+    """
+    if args.use_http:
+        from .httpcourse import HTTPCourse
+        from .session import HTTPSession
+
+        session = HTTPSession()
+        close = session.close
+        try:
+            catalog = load_catalog(args, session=session)
+            course = HTTPCourse(args.course, session, catalog)
+        except BaseException:
+            close()
+            raise
+    else:
+        from .booking import HSPCourse
+
+        driver = start_driver(args)
+        close = driver.quit
+        try:
+            catalog = load_catalog(args, driver=driver)
+            course = HSPCourse(args.course, driver, catalog=catalog)
+        except BaseException:
+            close()
+            raise
+    return course, close
+
+
+def hedged_booking(args):
+    """
+    Books with up to --hedge-sessions independent sessions, each with its
+    own webdriver or HTTP session, sharing one course list
+    """
+    from .hedge import HedgedBooking
+    from .session import HTTPSession
+
+    print("[*] HSP Course Booking")
+    credentials = parse_credentials(args.credentials, args.profile)
+    try:
+        with HTTPSession() as session:
+            catalog = load_catalog(args, session=session)
+    except LoadingFailed:
+        # every session reads the course list itself
+        catalog = None
+
+    def open_session():
+        if args.use_http:
+            from .httpcourse import HTTPCourse
+
+            session = HTTPSession()
+            try:
+                return HTTPCourse(args.course, session, catalog), session.close
+            except BaseException:
+                session.close()
+                raise
 
-    if args.subcommand == "check-credentials":
+        from .booking import HSPCourse
+
+        driver = start_driver(args)
+        try:
+            return HSPCourse(args.course, driver, catalog=catalog), driver.quit
+        except BaseException:
+            driver.quit()
+            raise
+
+    print("... Up to {} sessions, another one after {}s without "
+          "progress".format(max(1, args.hedge_sessions), args.hedge),
+          flush=True)
+    with HedgedBooking(open_session, credentials, delay=args.hedge,
+                       sessions=max(1, args.hedge_sessions)) as hedged:
+        try:
+            course = hedged.run(args.booking_out)
+        except CourseIdNotListed:
+            print("[ERROR] Course ID not listed")
+            exit(1)
+        except CourseNotBookable as e:
+            print("[ERROR] " + e.msg)
+            print("[ERROR] Course cannot be booked")
+            exit(1)
+        except (BookingFailed, LoadingFailed) as e:
+            print("[ERROR] Booking failed: " + e.msg)
+            exit(1)
+        print("... " + course.info())
+        print("[*] Booking done")
+
+
+def run_course_task(args, course):
+    from .clock import ClockSync
+    from .schedule import ScheduledBooking
+    from .watch import CourseWatcher
+
+    if args.subcommand == "booking":
+        print("[*] HSP Course Booking")
+        credentials = parse_credentials(args.credentials, args.profile)
+        print("... " + course.info(), flush=True)
+        try:
+            if args.at:
+                clock_sync = None if args.no_clock_sync else ClockSync()
+                scheduled = ScheduledBooking(
+                    course, credentials, args.at,
+                    warmup=args.warmup, grace=args.grace,
+                    clock_sync=clock_sync)
+                try:
+                    scheduled.run(args.booking_out)
+                finally:
+                    if clock_sync is not None:
+                        clock_sync.close()
+            else:
+                course.booking(credentials, args.booking_out)
+        except CourseNotBookable:
+            print("... " + course.status())
+            print("[ERROR] Course cannot be booked")
+        except BookingFailed as e:
+            print("[ERROR] Booking failed: " + e.msg)
+            exit(1)
+
+    elif args.subcommand == "watch":
+        print("[*] HSP Course Watch")
+        credentials = parse_credentials(args.credentials, args.profile)
+        print("... " + course.info(), flush=True)
+        watcher = CourseWatcher(
+            course, interval=args.interval,
+            min_interval=args.min_interval,
+            opening_times=[t.timestamp() for t in args.opens_at],
+            window=args.window)
+        try:
+            watcher.run(credentials, args.booking_out)
+        except KeyboardInterrupt:
+            print("[!] Watch stopped")
+
+
+def daemon_client(args):
+    """
+    Returns a client for a running 'hsp serve' daemon, if the command
+    can be run there. Traced and scheduled runs stay in this process, as do
+    commands needing a browser other than the daemon's.
+    """
+    if args.no_daemon or args.trace or getattr(args, "at", None) or \
+            getattr(args, "hedge", None) is not None:
+        return None
+    from .daemon import connect
+    client = connect(args.socket)
+    if client is not None and daemon_engine(args) == "browser" and \
+            client.info.get("browser") != browser_setup(args):
+        return None
+    return client
+
+
+def daemon_engine(args):
+    if browser_selected(args):
+        return "browser"
+    if args.use_http:
+        return "http"
+    # like without daemon, only status checks try plain HTTP first
+    return "auto" if args.subcommand == "course-status" else "browser"
+
+
+def run_on_daemon(args, client):
+    from .log import log
+
+    engine = daemon_engine(args)
+    # the daemon reloads its course list in memory
+    refresh = args.refresh or args.no_cache
+
+    if args.subcommand == "course-status":
+        print("[*] HSP Course Status", flush=True)
+        result = client.call("status", courses=read_course_ids(args),
+                             engine=engine, refresh=refresh)
+        if "results" not in result:
+            print("[ERROR] " + result["error"])
+            exit(1)
+        ok = True
+        for status in result["results"]:
+            if status["error"]:
+                print("[ERROR] " + status["error"], flush=True)
+                ok = False
+            else:
+                print("... " + status["info"])
+                print("... " + status["status"], flush=True)
+        if not ok:
+            exit(1)
+        return
+
+    # the daemon reads the files itself and reports invalid credentials
+    credentials = os.path.abspath(args.credentials)
+    confirmation_file = os.path.abspath(args.booking_out)
+
+    if args.subcommand == "booking":
+        print("[*] HSP Course Booking")
+        result = client.call("booking", course=args.course,
+                             credentials=credentials, profile=args.profile,
+                             confirmation_file=confirmation_file,
+                             engine=engine, refresh=refresh)
+        if result.get("info"):
+            print("... " + result["info"], flush=True)
+        if result["ok"]:
+            print("[*] Booking done")
+        elif result.get("reason") == "not bookable":
+            print("... " + result["status"])
+            print("[ERROR] Course cannot be booked")
+        else:
+            print("[ERROR] Booking failed: " + result["error"])
+            exit(1)
+
+    elif args.subcommand == "watch":
+        print("[*] HSP Course Watch")
+        try:
+            result = client.call(
+                "watch", on_log=log, course=args.course,
+                credentials=credentials, profile=args.profile,
+                confirmation_file=confirmation_file, engine=engine,
+                interval=args.interval, min_interval=args.min_interval,
+                opening_times=[t.timestamp() for t in args.opens_at],
+                window=args.window, refresh=refresh)
+        except KeyboardInterrupt:
+            print("[!] Watch stopped")
+            return
+        if result.get("error"):
+            print("[ERROR] " + result["error"])
+            exit(1)
+
+
+def serve(args):
+    from .daemon import HSPDaemon, connect
+
+    if args.stop:
+        client = connect(args.socket)
+        if client is None:
+            print("[ERROR] No daemon is running")
+            exit(1)
+        client.call("shutdown")
+        print("[*] Daemon stopped")
+        return
+
+    print("[*] HSP Daemon", flush=True)
+    daemon = HSPDaemon(args.socket, driver_factory=driver_factory(args),
+                       pool_size=args.pool_size,
+                       catalog_ttl=args.catalog_ttl,
+                       use_cache=not args.no_cache, store=args.store,
+                       browser=browser_setup(args))
+    try:
+        daemon.serve_forever()
+    except DaemonUnavailable as e:
+        print("[ERROR] " + e.msg)
+        exit(1)
+    except KeyboardInterrupt:
+        print("[!] Daemon stopped")
+
+
+def run_subcommand(args):
+
+    if args.subcommand in ("course-status", "booking", "watch"):
+        client = daemon_client(args)
+        if client is not None:
+            try:
+                run_on_daemon(args, client)
+                return
+            except DaemonUnavailable as e:
+                if args.subcommand != "course-status":
+                    # the booking may have been sent, it is not repeated
+                    print("[ERROR] " + e.msg)
+                    exit(1)
+                print("[!] " + e.msg)
+
+    if args.subcommand == "check-credentials" and args.store:
+        check_credentials_store(args)
+
+    elif args.subcommand == "check-credentials":
         print("[*] HSP Credential-File Checking")
         try:
-            credentials = parse_credentials(args.credentials)
+            credentials = parse_credentials(args.credentials, args.profile)
         except InvalidCredentials as e:
             print(e)
             print("[!] INVALID CREDENTIALS")
         else:
             print("Credentials are most likely O.K. :)")
 
-    else:
-        if args.use_firefox:
-            driver = start_firefox()
-        elif args.use_headless_firefox:
-            driver = start_headless_firefox()
-        elif args.use_chrome:
-            driver = start_chrome()
-        else:
-            driver = start_headless_chrome()
+    elif args.subcommand == "course-status":
+        course_status(args)
+
+    elif args.subcommand == "batch-book":
+        batch_book(args)
+
+    elif args.subcommand == "catalog":
+        export_catalog(args)
+
+    elif args.subcommand == "feed":
+        course_feed(args)
 
+    elif args.subcommand == "serve":
+        serve(args)
+
+    elif args.subcommand == "clock-sync":
+        from .clock import ClockSync
+
+        print("[*] HSP Server Clock Offset")
+        try:
+            with ClockSync(samples=args.samples) as clock_sync:
+                estimate = clock_sync.estimate()
+        except LoadingFailed as e:
+            print("[ERROR] " + e.msg)
+            exit(1)
+        print("... Offset: {:+.3f}s (server clock minus local clock)".format(
+            estimate.offset))
+        print("... Uncertainty: +/- {:.3f}s".format(estimate.uncertainty))
+        print("... Round trip time: {:.3f}s (median of {} requests)".format(
+            estimate.rtt, estimate.samples))
+
+    elif args.subcommand == "booking" and args.hedge is not None:
+        hedged_booking(args)
+
+    else:
         try:
-            course = HSPCourse(args.course, driver)
+            course, close = open_course(args)
         except CourseIdNotListed:
             print("[ERROR] Course ID not listed")
             exit(1)
 
-        if args.subcommand == "course-status":
-                print("[*] HSP Course Status")
-                print("... " + course.info())
-                print("... " + course.status())
+        try:
+            run_course_task(args, course)
+        finally:
+            close()
 
-        elif args.subcommand == "booking":
-            print("[*] HSP Course Booking")
-            credentials = parse_credentials(args.credentials)
-            print("... " + course.info())
-            try: course.booking(credentials)
-            except CourseNotBookable:
-                print("... " + course.status())
-                print("[ERROR] Course cannot be booked")
+
+def main():
+
+    args = parse_args()
+
+    if getattr(args, "trace", None):
+        trace.enable()
+        try:
+            with trace.span(args.subcommand):
+                run_subcommand(args)
+        finally:
+            trace.tracer().save(args.trace)
+            print("[*] Trace written to {}".format(args.trace))
+    else:
+        run_subcommand(args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,419 @@
+"""
+Browserless parsers for the hochschulsport course list and course pages.
+They extract the same information HSPCourse reads through the webdriver.
+"""
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+
+VOID_ELEMENTS = frozenset(("area", "base", "br", "col", "embed", "hr", "img",
+                           "input", "link", "meta", "param", "source",
+                           "track", "wbr"))
+
+COURSE_ANCHOR = re.compile(r"""<a\b[^>]*\bid=["']K([^"']+)["']""", re.I)
+
+COURSE_LIST_CELLS = {
+    "bs_szeit": "time",
+    "bs_stag": "weekday",
+    "bs_sort": "location",
+    "bs_sdet": "level",
+}
+
+
+def _normalize(text):
+    return " ".join(text.split())
+
+
+def classify_status(tag_name, css_class, text):
+    """
+    Map the element following the 'K<course_id>' anchor of a course page to
+    (course_status, booking_possible, waitinglist_exists)
+    """
+
+    # If the element is a <span> ... </span> element,
+    # the course is not bookable and it contains a
+    # no-booking-possible status
+    if tag_name == "span":
+        return text, False, False
+
+    elif "bs_btn_warteliste" in (css_class or ""):
+        return "queue signup", False, True
+
+    elif "bs_btn_buchen" in (css_class or ""):
+        return "booking possible", True, False
+
+    else:
+        return "unknown", False, False
+
+
+class CourseListParser(HTMLParser):
+    """
+    Collects all rows of the course list table.
+    Each row is a dict with the cell texts of the course id, time, weekday,
+    location and level columns and the absolute link to the course page.
+    """
+
+    def __init__(self, base_url):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.rows = []
+        self._row = None
+        self._cell = None
+        self._cell_text = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "tr":
+            self._row = {"cells": [], "link": None}
+        elif self._row is None:
+            return
+        elif tag == "td":
+            self._cell = attrs.get("class") or ""
+            self._cell_text = []
+        elif tag == "a" and self._cell == "bs_sbuch" and \
+                self._row["link"] is None and attrs.get("href"):
+            self._row["link"] = urljoin(self.base_url, attrs["href"])
+
+    def handle_endtag(self, tag):
+        if self._row is None:
+            return
+        if tag == "td" and self._cell is not None:
+            self._row["cells"].append(
+                (self._cell, _normalize("".join(self._cell_text))))
+            self._cell = None
+            self._cell_text = None
+        elif tag == "tr":
+            self._finish_row()
+
+    def handle_data(self, data):
+        if self._cell_text is not None:
+            self._cell_text.append(data)
+
+    def _finish_row(self):
+        cells, link = self._row["cells"], self._row["link"]
+        self._row = None
+        if not cells:
+            return
+
+        # the course number cell, or the first cell of the row
+        course_id = next((text for cls, text in cells if cls == "bs_sknr"),
+                         cells[0][1])
+        if not course_id:
+            return
+
+        row = {"course_id": course_id, "course_page_url": link}
+        row.update({field: None for field in COURSE_LIST_CELLS.values()})
+        for cls, text in cells:
+            if cls in COURSE_LIST_CELLS:
+                row[COURSE_LIST_CELLS[cls]] = text
+        self.rows.append(row)
+
+    def close(self):
+        super().close()
+        return self.rows
+
+
+class CoursePageParser(HTMLParser):
+    """
+    Extracts the course name ('bs_head' div) and the element following
+    each 'K<course_id>' anchor of a course page.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.course_name = None
+        self.elements = {}
+        self._head_depth = None
+        self._head_text = []
+        self._anchor = None       # course id of the currently open anchor
+        self._anchor_depth = 0
+        self._pending = None      # course id waiting for its next element
+        self._capture = None      # [course_id, tag, class, text parts, depth]
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+
+        if self._head_depth is not None:
+            self._head_depth += tag not in VOID_ELEMENTS
+        elif self.course_name is None and tag == "div" and \
+                attrs.get("class") == "bs_head":
+            self._head_depth = 1
+            self._head_text = []
+
+        if self._capture is not None:
+            self._capture[4] += tag not in VOID_ELEMENTS
+            return
+
+        if self._anchor is not None:
+            self._anchor_depth += tag not in VOID_ELEMENTS
+            return
+
+        if self._pending is not None:
+            course_id = self._pending
+            self._pending = None
+            self._capture = [course_id, tag, attrs.get("class") or "", [], 1]
+            if tag in VOID_ELEMENTS:
+                self._finish_capture()
+            return
+
+        anchor_id = attrs.get("id") or ""
+        if tag == "a" and anchor_id.startswith("K"):
+            self._anchor = anchor_id[1:]
+            self._anchor_depth = 1
+
+    def handle_startendtag(self, tag, attrs):
+        # self-closing tags like <input ... /> do not have an end tag
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self._head_depth is not None:
+            self._head_depth -= 1
+            if self._head_depth == 0:
+                self.course_name = _normalize("".join(self._head_text))
+                self._head_depth = None
+
+        if self._capture is not None:
+            self._capture[4] -= 1
+            if self._capture[4] == 0:
+                self._finish_capture()
+
+        elif self._anchor is not None:
+            self._anchor_depth -= 1
+            if self._anchor_depth == 0:
+                self._pending = self._anchor
+                self._anchor = None
+
+    def handle_data(self, data):
+        if self._head_depth is not None:
+            self._head_text.append(data)
+        if self._capture is not None:
+            self._capture[3].append(data)
+
+    def _finish_capture(self):
+        course_id, tag, css_class, text, _ = self._capture
+        self._capture = None
+        self.elements.setdefault(
+            course_id, (tag, css_class, _normalize("".join(text))))
+
+
+def parse_course_list(html, base_url):
+    """
+    Returns a list of row dicts of the course list page
+    """
+    parser = CourseListParser(base_url)
+    parser.feed(html)
+    return parser.close()
+
+
+def parse_course_page(html):
+    """
+    Returns the course name and a dict mapping the course ids found on the
+    page to (course_status, booking_possible, waitinglist_exists)
+    """
+    parser = CoursePageParser()
+    parser.feed(html)
+    parser.close()
+    statuses = {course_id: classify_status(*element)
+                for course_id, element in parser.elements.items()}
+    return parser.course_name, statuses
+
+
+def course_rows(html):
+    """
+    Splits a course page into the table row of each 'K<course_id>' anchor,
+    by text search without parsing. Returns a dict of course id to the
+    row's HTML, which holds the course's details and booking status.
+    """
+    rows = {}
+    for match in COURSE_ANCHOR.finditer(html):
+        start = html.rfind("<tr", 0, match.start())
+        end = html.find("</tr>", match.end())
+        if start < 0 or end < 0:
+            # not in a table, the anchor and what follows it
+            start, end = match.start(), match.end() + 2000
+        rows.setdefault(match.group(1), html[start:end + len("</tr>")])
+    return rows
+
+
+def parse_course_row(html, course_id):
+    """
+    Parses one row returned by course_rows(). Returns a dict of the row's
+    time, weekday, location and level and the course's course_status,
+    booking_possible and waitinglist_exists, or None if the row has no
+    booking button or status element.
+    """
+    parser = CoursePageParser()
+    parser.feed(html)
+    parser.close()
+    if course_id not in parser.elements:
+        return None
+
+    list_parser = CourseListParser("")
+    list_parser.feed(html)
+    rows = list_parser.close()
+    row = rows[0] if rows else {}
+    fields = {field: row.get(field) for field in COURSE_LIST_CELLS.values()}
+    (fields["course_status"],
+     fields["booking_possible"],
+     fields["waitinglist_exists"]) = classify_status(
+        *parser.elements[course_id])
+    return fields
+
+
+class Form:
+    """
+    A parsed HTML form with its controls in document order.
+    Each control is a dict of its attributes plus 'tag' and, for selects,
+    'options' as a list of (value, selected) pairs. Anchors with an id are
+    kept as controls as well, to locate the control following them.
+    """
+
+    def __init__(self, action, method, controls=None):
+        self.action = action
+        self.method = method
+        self.controls = controls or []
+
+    def find(self, **attrs):
+        """
+        First control with all the given attribute values, or None
+        """
+        for control in self.controls:
+            if all(control.get(k) == v for k, v in attrs.items()):
+                return control
+        return None
+
+    def following(self, anchor_id):
+        """
+        The control directly following the anchor with the given id
+        """
+        for i, control in enumerate(self.controls[:-1]):
+            if control["tag"] == "a" and control.get("id") == anchor_id:
+                return self.controls[i + 1]
+        return None
+
+    def values(self):
+        """
+        The name/value pairs the form submits by default, without buttons
+        """
+        values = []
+        for control in self.controls:
+            name = control.get("name")
+            if not name or "disabled" in control:
+                continue
+            if control["tag"] == "select":
+                options = control["options"]
+                selected = [v for v, s in options if s] or \
+                    [v for v, _ in options[:1]]
+                values.extend((name, v) for v in selected)
+            elif control["tag"] == "textarea":
+                values.append((name, control.get("text", "")))
+            elif control["tag"] == "input":
+                input_type = (control.get("type") or "text").lower()
+                if input_type in ("submit", "button", "image", "reset",
+                                  "file"):
+                    continue
+                if input_type in ("checkbox", "radio") and \
+                        "checked" not in control:
+                    continue
+                values.append((name, control.get("value", "on"
+                               if input_type in ("checkbox", "radio")
+                               else "")))
+        return values
+
+
+class FormParser(HTMLParser):
+    """
+    Collects all forms of a page and the (tag, class) pairs of all elements,
+    e.g. to check for the confirmation ticket.
+    """
+
+    def __init__(self, base_url):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.forms = []
+        self.classes = []
+        self._form = None
+        self._select = None
+        self._option = None
+        self._textarea = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {k: "" if v is None else v for k, v in attrs}
+        if attrs.get("class"):
+            self.classes.append((tag, attrs["class"]))
+
+        if tag == "form":
+            action = urljoin(self.base_url, attrs.get("action") or "")
+            method = (attrs.get("method") or "GET").upper()
+            self._form = Form(action, method)
+            self.forms.append(self._form)
+            return
+
+        if self._form is None:
+            return
+
+        if tag in ("input", "button", "select", "textarea") or \
+                (tag == "a" and attrs.get("id")):
+            control = dict(attrs, tag=tag)
+            if tag == "button":
+                control["tag"] = "input"
+                control.setdefault("type", "submit")
+            self._form.controls.append(control)
+            if tag == "select":
+                control["options"] = []
+                self._select = control
+            elif tag == "textarea":
+                control["text"] = ""
+                self._textarea = control
+
+        elif tag == "option" and self._select is not None:
+            self._close_option()
+            self._option = [attrs.get("value"), "selected" in attrs, ""]
+            self._select["options"].append(self._option)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag == "form":
+            self._form = None
+        elif tag == "select":
+            self._close_option()
+            self._select = None
+        elif tag == "option":
+            self._close_option()
+        elif tag == "textarea":
+            self._textarea = None
+
+    def handle_data(self, data):
+        if self._option is not None:
+            self._option[2] += data
+        if self._textarea is not None:
+            self._textarea["text"] += data
+
+    def _close_option(self):
+        if self._option is not None:
+            value, selected, text = self._option
+            # options without a value attribute submit their text
+            option = (text.strip() if value is None else value, selected)
+            self._select["options"][-1] = option
+            self._option = None
+
+    def has_element(self, tag, *classes):
+        return any(t == tag and set(classes) <= set(c.split())
+                   for t, c in self.classes)
+
+
+def parse_forms(html, base_url):
+    """
+    Returns a FormParser holding the forms and element classes of a page
+    """
+    parser = FormParser(base_url)
+    parser.feed(html)
+    parser.close()
+    return parser
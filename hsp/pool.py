@@ -0,0 +1,218 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from selenium.common.exceptions import WebDriverException
+from .booking import start_headless_chrome
+
+
+def _process_tree_rss(pid):
+    """
+    Resident memory in bytes of a process and all its descendants.
+    Returns None where /proc is not available.
+    """
+    try:
+        children = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open("/proc/{}/stat".format(entry), "r") as sf:
+                    ppid = int(sf.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+
+        rss = 0
+        pagesize = os.sysconf("SC_PAGE_SIZE")
+        pending = [pid]
+        while pending:
+            current = pending.pop()
+            pending.extend(children.get(current, ()))
+            try:
+                with open("/proc/{}/statm".format(current), "r") as mf:
+                    rss += int(mf.read().split()[1]) * pagesize
+            except (OSError, IndexError, ValueError):
+                continue
+        return rss
+    except (OSError, ValueError):
+        return None
+
+
+def driver_memory(driver):
+    """
+    Memory used by the webdriver and its browser processes in bytes,
+    or None if it cannot be determined.
+    """
+    try:
+        pid = driver.service.process.pid
+    except AttributeError:
+        return None
+    return _process_tree_rss(pid)
+
+
+class DriverPool:
+    """
+    Keeps up to 'size' webdrivers warm and hands them out one at a time.
+    Returned drivers are reset (extra tabs closed, cookies cleared), drivers
+    failing a health check, used 'max_uses' times or grown beyond
+    'max_growth' times their memory after the first use are replaced by
+    fresh ones.
+    """
+
+    def __init__(self, size=2, factory=start_headless_chrome, max_uses=50,
+                 max_growth=2.0, prestart=True):
+        self.size = size
+        self.factory = factory
+        self.max_uses = max_uses
+        self.max_growth = max_growth
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._drivers = {}  # id(driver) -> [driver, uses, baseline memory]
+        self._starting = 0  # drivers being started by acquire()
+        self._closed = False
+
+        if prestart:
+            for _ in range(size):
+                self._idle.put(self._create())
+
+    def _create(self):
+        driver = self.factory()
+        with self._lock:
+            self._drivers[id(driver)] = [driver, 0, None]
+        return driver
+
+    def _discard(self, driver):
+        with self._lock:
+            self._drivers.pop(id(driver), None)
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    def _is_healthy(self, driver):
+        try:
+            return len(driver.window_handles) > 0
+        except WebDriverException:
+            return False
+
+    def _is_worn_out(self, driver):
+        entry = self._drivers[id(driver)]
+        _, uses, baseline = entry
+        if self.max_uses and uses >= self.max_uses:
+            return True
+        if self.max_growth:
+            current = driver_memory(driver)
+            # the baseline is taken after the first use, when the browser
+            # has loaded the pages it works with
+            if baseline is None:
+                entry[2] = current
+            elif current and current > baseline * self.max_growth:
+                return True
+        return False
+
+    def _reset(self, driver):
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+
+        # chrome clears all cookies at once, otherwise only the
+        # cookies of the current page's domain can be deleted
+        if hasattr(driver, "execute_cdp_cmd"):
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        else:
+            driver.delete_all_cookies()
+        driver.get("about:blank")
+
+    def acquire(self, timeout=None):
+        """
+        Returns a healthy idle driver, starting a new one if the pool is not
+        full yet. Blocks up to 'timeout' seconds if all drivers are in use.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            if self._closed:
+                raise RuntimeError("DriverPool is closed")
+
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_create = \
+                        len(self._drivers) + self._starting < self.size
+                    if can_create:
+                        # the slot is taken before the slow browser start
+                        self._starting += 1
+                if can_create:
+                    try:
+                        driver = self._create()
+                    finally:
+                        with self._lock:
+                            self._starting -= 1
+                else:
+                    # wake up regularly, a discarded driver frees a slot
+                    wait = 0.5
+                    if deadline is not None:
+                        wait = min(wait, deadline - time.monotonic())
+                        if wait <= 0:
+                            raise TimeoutError("No webdriver available")
+                    try:
+                        driver = self._idle.get(timeout=wait)
+                    except queue.Empty:
+                        continue
+
+            if self._is_healthy(driver):
+                with self._lock:
+                    self._drivers[id(driver)][1] += 1
+                return driver
+            self._discard(driver)
+
+    def release(self, driver, discard=False):
+        """
+        Returns a driver to the pool. It is reset for the next user, or
+        replaced if it is broken or worn out.
+        """
+        if id(driver) not in self._drivers:
+            return
+
+        if not discard and not self._closed:
+            try:
+                if not self._is_worn_out(driver):
+                    self._reset(driver)
+                    self._idle.put(driver)
+                    return
+            except WebDriverException:
+                pass
+
+        self._discard(driver)
+
+    @contextmanager
+    def driver(self, timeout=None):
+        driver = self.acquire(timeout)
+        try:
+            yield driver
+        except WebDriverException:
+            self.release(driver, discard=True)
+            raise
+        except BaseException:
+            self.release(driver)
+            raise
+        else:
+            self.release(driver)
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            drivers = [entry[0] for entry in self._drivers.values()]
+        for driver in drivers:
+            self._discard(driver)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
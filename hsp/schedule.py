@@ -0,0 +1,111 @@
+import time
+from datetime import datetime
+from .log import log
+from .errors import CourseNotBookable, InvalidCredentials, LoadingFailed
+
+
+def wait_until(target, spin=0.02):
+    """
+    Block until the local clock reaches the timestamp 'target'.
+    Sleeps for most of the time and busy-waits for the last 'spin' seconds,
+    since sleep() may overshoot by several milliseconds.
+    """
+    while True:
+        remaining = target - time.time()
+        if remaining <= 0:
+            return
+        if remaining > spin:
+            time.sleep(remaining - spin)
+        else:
+            time.sleep(0)
+
+
+class ScheduledBooking:
+    """
+    Books a course at a fixed point in time.
+    Everything that can be done before the registration opens is done ahead:
+    the driver is started, the course is resolved, the credentials are
+    validated and the course page is reloaded 'warmup' seconds early to have
+    warm connections and caches. At the target time only the status check
+    and the booking itself remain.
+
+    With a ClockSync, 'at' is taken as server time. The local trigger time
+    is corrected by the estimated clock offset and moved early by its
+    uncertainty and half a round trip, so the first status check does not
+    reach the server late.
+    """
+
+    def __init__(self, course, credentials, at, warmup=30, grace=60,
+                 poll=0.1, clock_sync=None):
+        self.course = course
+        self.credentials = credentials
+        self.at = at.timestamp() if isinstance(at, datetime) else at
+        self.warmup = warmup
+        self.grace = grace
+        self.poll = poll
+        self.clock_sync = clock_sync
+        self.clock_offset = None
+
+    def trigger_time(self):
+        """
+        Local timestamp at which the booking is started
+        """
+        if self.clock_offset is None:
+            return self.at
+        return self.at - self.clock_offset.offset - \
+            self.clock_offset.uncertainty - self.clock_offset.rtt / 2
+
+    def sync_clock(self):
+        if self.clock_sync is None:
+            return
+        try:
+            self.clock_offset = self.clock_sync.estimate()
+        except LoadingFailed as e:
+            log("[!] Clock sync failed: " + e.msg)
+            return
+        log("Server clock offset {:+.3f}s (+/- {:.3f}s)".format(
+            self.clock_offset.offset, self.clock_offset.uncertainty))
+
+    def stage(self):
+        if not self.credentials or not self.credentials.is_valid():
+            raise InvalidCredentials("Credentials are invalid")
+
+        self.sync_clock()
+        log("Booking staged for {}".format(datetime.fromtimestamp(
+            self.trigger_time()).isoformat(timespec="milliseconds")))
+
+        wait_until(self.trigger_time() - self.warmup)
+        try:
+            self.course.refresh_status()
+        except LoadingFailed as e:
+            log("[!] Warmup failed: " + e.msg)
+
+        # the local clock may have drifted since the first estimate
+        self.sync_clock()
+
+    def wait_until_bookable(self):
+        trigger = self.trigger_time()
+        wait_until(trigger)
+
+        # the registration may open slightly later than announced
+        deadline = trigger + self.grace
+        status = "Course page could not be loaded"
+        while True:
+            try:
+                self.course.refresh_status()
+            except LoadingFailed as e:
+                log("[!] " + e.msg)
+            else:
+                if self.course.is_bookable():
+                    return
+                status = self.course.status()
+            if time.time() > deadline:
+                raise CourseNotBookable(self.course.course_id, status)
+            time.sleep(self.poll)
+
+    def run(self, confirmation_file=None):
+        self.stage()
+        self.wait_until_bookable()
+        log("Booking")
+        self.course.booking(self.credentials, confirmation_file)
+        log("Booking done")
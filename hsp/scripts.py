@@ -0,0 +1,125 @@
+"""
+Scripts that read or fill a whole page region in a single webdriver round
+trip. They locate elements with the same XPath expressions as the
+per-element code in HSPCourse, which remains the fallback if a script fails.
+"""
+
+# arguments: course id
+# returns the course row fields, or {found: false} if the id is not listed
+# or has no course page link
+COURSE_ROW = """
+var courseId = arguments[0];
+var cells = document.getElementsByTagName("td");
+var row = null;
+for (var i = 0; i < cells.length; i++) {
+    if (cells[i].textContent === courseId) {
+        row = cells[i].parentNode;
+        break;
+    }
+}
+if (row === null || row.tagName.toLowerCase() !== "tr") {
+    return {found: false};
+}
+function cellText(cls) {
+    var td = row.querySelector('td[class="' + cls + '"]');
+    // textContent, unlike innerText, ignores the course list filter
+    return td === null ? null :
+        td.textContent.replace(/\s+/g, " ").trim();
+}
+var link = row.querySelector('td[class="bs_sbuch"] a');
+if (link === null) {
+    return {found: false};
+}
+return {
+    found: true,
+    time: cellText("bs_szeit"),
+    weekday: cellText("bs_stag"),
+    location: cellText("bs_sort"),
+    level: cellText("bs_sdet"),
+    href: link.href
+};
+"""
+
+# arguments: course id
+# returns the course name and the booking button or status element,
+# null fields if they are missing
+COURSE_STATUS = """
+function first(xpath) {
+    return document.evaluate(xpath, document, null,
+        XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+}
+var head = first("//div[@class='bs_head']");
+var el = first("//a[@id='K" + arguments[0] + "']/following::*");
+return {
+    name: head === null ? null : head.innerText,
+    tag: el === null ? null : el.tagName.toLowerCase(),
+    cls: el === null ? null : el.getAttribute("class"),
+    text: el === null ? null : el.innerText
+};
+"""
+
+# arguments: booking button element
+# makes its form, which targets a new tab, submit in the current tab.
+# returns the form action, or null if the button is not in a form
+SAME_TAB_FORM = """
+var form = arguments[0].form;
+if (!form) {
+    return null;
+}
+form.removeAttribute("target");
+return form.action;
+"""
+
+# arguments: list of [xpath, value] pairs, a null value clicks the element
+# fills nothing unless all elements exist, then reads every field back.
+# returns {missing: [xpath, ...], wrong: [xpath, ...]}
+FILL_FORM = """
+function first(xpath) {
+    return document.evaluate(xpath, document, null,
+        XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+}
+function fire(el, type) {
+    el.dispatchEvent(new Event(type, {bubbles: true}));
+}
+var fields = arguments[0];
+var elements = [];
+var missing = [];
+for (var i = 0; i < fields.length; i++) {
+    var el = first(fields[i][0]);
+    if (el === null) {
+        missing.push(fields[i][0]);
+    }
+    elements.push(el);
+}
+if (missing.length > 0) {
+    return {missing: missing, wrong: []};
+}
+
+for (var i = 0; i < fields.length; i++) {
+    var el = elements[i];
+    var value = fields[i][1];
+    if (value !== null) {
+        el.focus();
+        el.value = value;
+        fire(el, "input");
+        fire(el, "change");
+    } else if (el.tagName.toLowerCase() === "option") {
+        el.selected = true;
+        fire(el.parentNode.closest("select") || el.parentNode, "change");
+    } else if (!el.checked) {
+        el.click();
+    }
+}
+
+var wrong = [];
+for (var i = 0; i < fields.length; i++) {
+    var el = elements[i];
+    var value = fields[i][1];
+    var ok = value !== null ? el.value === value :
+        (el.tagName.toLowerCase() === "option" ? el.selected : el.checked);
+    if (!ok) {
+        wrong.push(fields[i][0]);
+    }
+}
+return {missing: missing, wrong: wrong};
+"""
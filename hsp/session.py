@@ -0,0 +1,204 @@
+import gzip
+import http.client
+import threading
+import zlib
+from urllib.parse import urlencode, urljoin, urlsplit
+from .errors import LoadingFailed
+from . import trace
+
+
+DEFAULT_HEADERS = {
+    "User-Agent": "hsp (+https://github.com/JulianFlesch/hsp)",
+    "Accept": "text/html,application/xhtml+xml,*/*;q=0.8",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+
+class Response:
+    """
+    Result of a HTTPSession request with the body already read and decoded.
+    """
+
+    def __init__(self, url, status, headers, content):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        charset = "utf-8"
+        content_type = self.headers.get("content-type", "")
+        for param in content_type.split(";")[1:]:
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "charset" and value:
+                charset = value.strip('"')
+        try:
+            return self.content.decode(charset)
+        except (LookupError, UnicodeDecodeError):
+            return self.content.decode("latin-1")
+
+
+class HTTPSession:
+    """
+    Minimal keep-alive HTTP client.
+    One persistent connection is kept per host, cookies set by the server
+    are sent along with subsequent requests to the same host.
+    """
+
+    def __init__(self, timeout=20, headers=None):
+        self.timeout = timeout
+        self.headers = dict(DEFAULT_HEADERS)
+        self.headers.update(headers or {})
+        self.cookies = {}
+        self._connections = {}
+
+    def _connection(self, scheme, netloc):
+        key = (scheme, netloc)
+        conn = self._connections.get(key)
+        if conn is None:
+            if scheme == "https":
+                conn = http.client.HTTPSConnection(netloc, timeout=self.timeout)
+            else:
+                conn = http.client.HTTPConnection(netloc, timeout=self.timeout)
+            self._connections[key] = conn
+        return conn
+
+    def _drop_connection(self, scheme, netloc):
+        conn = self._connections.pop((scheme, netloc), None)
+        if conn is not None:
+            conn.close()
+
+    def _cookie_header(self, netloc):
+        cookies = self.cookies.get(netloc)
+        if cookies:
+            return "; ".join("{}={}".format(k, v) for k, v in cookies.items())
+        return None
+
+    def _store_cookies(self, netloc, message):
+        for header in message.get_all("Set-Cookie") or []:
+            name, _, value = header.split(";", 1)[0].partition("=")
+            if name.strip():
+                self.cookies.setdefault(netloc, {})[name.strip()] = value.strip()
+
+    @staticmethod
+    def _decode(content, encoding):
+        encoding = (encoding or "").lower()
+        if encoding == "gzip":
+            return gzip.decompress(content)
+        if encoding == "deflate":
+            return zlib.decompress(content)
+        return content
+
+    def _send(self, method, url, body, headers):
+        trace.count("http requests")
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        request_headers = dict(self.headers)
+        request_headers.update(headers or {})
+        cookie = self._cookie_header(parts.netloc)
+        if cookie:
+            request_headers["Cookie"] = cookie
+
+        # a kept-alive connection may have been closed by the server in the
+        # meantime, in that case the request is sent once more on a new one
+        for attempt in range(2):
+            reused = (parts.scheme, parts.netloc) in self._connections
+            conn = self._connection(parts.scheme, parts.netloc)
+            try:
+                conn.request(method, path, body=body, headers=request_headers)
+                resp = conn.getresponse()
+                content = resp.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError,
+                    BrokenPipeError, http.client.BadStatusLine) as e:
+                self._drop_connection(parts.scheme, parts.netloc)
+                if reused and attempt == 0:
+                    continue
+                raise LoadingFailed("{} {}: {}".format(method, url, e))
+            except (OSError, http.client.HTTPException) as e:
+                self._drop_connection(parts.scheme, parts.netloc)
+                raise LoadingFailed("{} {}: {}".format(method, url, e))
+            break
+
+        if resp.will_close:
+            self._drop_connection(parts.scheme, parts.netloc)
+
+        self._store_cookies(parts.netloc, resp.msg)
+        response_headers = {k.lower(): v for k, v in resp.getheaders()}
+        content = self._decode(content, response_headers.get("content-encoding"))
+        return Response(url, resp.status, response_headers, content)
+
+    def request(self, method, url, data=None, headers=None, max_redirects=5):
+        body = None
+        headers = dict(headers or {})
+        if data is not None:
+            body = urlencode(data).encode("utf-8")
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+
+        for _ in range(max_redirects + 1):
+            response = self._send(method, url, body, headers)
+            if response.status not in REDIRECT_CODES:
+                break
+            url = urljoin(url, response.headers.get("location", ""))
+            if response.status not in (307, 308):
+                method, body = "GET", None
+                headers.pop("Content-Type", None)
+        else:
+            raise LoadingFailed("Too many redirects: {}".format(url))
+
+        if response.status >= 400:
+            raise LoadingFailed("{} {}: HTTP {}".format(method, url,
+                                                        response.status))
+        return response
+
+    def get(self, url, headers=None):
+        return self.request("GET", url, headers=headers)
+
+    def post(self, url, data, headers=None):
+        return self.request("POST", url, data=data, headers=headers)
+
+    def close(self):
+        for key in list(self._connections):
+            self._drop_connection(*key)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ThreadSessions:
+    """
+    One keep-alive HTTP session per thread, for worker threads fetching
+    pages concurrently. close() closes the sessions of all threads.
+    """
+
+    def __init__(self, factory=HTTPSession):
+        self.factory = factory
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        try:
+            return self._local.session
+        except AttributeError:
+            session = self.factory()
+            with self._lock:
+                self._sessions.append(session)
+            self._local.session = session
+            return session
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+            self._local = threading.local()
+        for session in sessions:
+            session.close()
@@ -0,0 +1,153 @@
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Tracer:
+    """
+    Records timed spans per thread. Every span counts the webdriver commands,
+    HTTP requests and other counted events that happened while it was open,
+    including those of nested spans.
+    The spans can be saved in the Chrome trace event format, which is
+    loaded by chrome://tracing and https://ui.perfetto.dev
+    """
+
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._start = time.perf_counter()
+        self._pid = os.getpid()
+
+    def _stack(self):
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def _now(self):
+        # microseconds since the tracer was started
+        return (time.perf_counter() - self._start) * 1e6
+
+    @contextmanager
+    def span(self, name, **args):
+        counts = {}
+        stack = self._stack()
+        stack.append(counts)
+        started = self._now()
+        try:
+            yield counts
+        finally:
+            duration = self._now() - started
+            stack.pop()
+            event = {
+                "name": name,
+                "cat": "hsp",
+                "ph": "X",
+                "ts": started,
+                "dur": duration,
+                "pid": self._pid,
+                "tid": threading.get_ident(),
+                "args": dict(args, **counts),
+            }
+            with self._lock:
+                self.events.append(event)
+
+    def count(self, name, n=1):
+        for counts in self._stack():
+            counts[name] = counts.get(name, 0) + n
+
+    def mark(self, name, **args):
+        event = {
+            "name": name,
+            "cat": "hsp",
+            "ph": "i",
+            "s": "t",
+            "ts": self._now(),
+            "pid": self._pid,
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def save(self, path):
+        with self._lock:
+            events = sorted(self.events, key=lambda e: e["ts"])
+        with open(path, "w") as tf:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, tf)
+
+
+_tracer = None
+
+
+def enable():
+    """
+    Start recording spans for the rest of the process and return the tracer
+    """
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+def disable():
+    global _tracer
+    _tracer = None
+
+
+def tracer():
+    return _tracer
+
+
+@contextmanager
+def span(name, **args):
+    """
+    Time a phase, a no-op unless tracing is enabled
+    """
+    if _tracer is None:
+        yield {}
+    else:
+        with _tracer.span(name, **args) as counts:
+            yield counts
+
+
+def count(name, n=1):
+    if _tracer is not None:
+        _tracer.count(name, n)
+
+
+def percentile(values, p):
+    """
+    Nearest-rank percentile of an unsorted list
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), math.ceil(p / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+def instrument(driver):
+    """
+    Count every command sent to the webdriver in the open spans, as
+    'webdriver' in total and 'webdriver.<command>' per command.
+    Only instruments the driver while tracing is enabled.
+    """
+    if _tracer is None or getattr(driver, "_hsp_traced", False):
+        return driver
+
+    execute = driver.execute
+
+    def traced_execute(driver_command, params=None):
+        count("webdriver")
+        count("webdriver." + driver_command)
+        return execute(driver_command, params)
+
+    driver.execute = traced_execute
+    driver._hsp_traced = True
+    return driver
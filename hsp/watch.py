@@ -0,0 +1,118 @@
+import re
+import threading
+import time
+from datetime import datetime
+from .log import log
+from .errors import LoadingFailed
+
+
+# course pages announce the start of the registration as e.g. "ab 20.10., 08:00"
+OPENING_PATTERN = re.compile(
+    r"ab\s+(\d{1,2})\.(\d{1,2})\.(\d{2,4})?,?\s+(\d{1,2})[:.](\d{2})")
+
+
+def parse_opening_time(status, now=None):
+    """
+    Returns the registration opening time announced in a course status
+    as a timestamp, or None if the status does not announce one.
+    """
+    match = OPENING_PATTERN.search(status or "")
+    if match is None:
+        return None
+
+    now = now or datetime.now()
+    day, month, year, hour, minute = match.groups()
+    if year is None:
+        year = now.year
+    elif len(year) == 2:
+        year = 2000 + int(year)
+
+    try:
+        opening = datetime(int(year), int(month), int(day),
+                           int(hour), int(minute))
+        # a date without year that lies far in the past refers to next year
+        if match.group(3) is None and (now - opening).days > 180:
+            opening = opening.replace(year=opening.year + 1)
+    except ValueError:
+        return None
+    return opening.timestamp()
+
+
+def poll_interval(now, opening_times, interval, min_interval, window):
+    """
+    Seconds to wait until the next poll.
+    Within 'window' seconds around a known opening time the course is polled
+    every 'min_interval' seconds, otherwise every 'interval' seconds, but a
+    poll is never scheduled later than the start of the next window.
+    """
+    for opening in opening_times:
+        if opening - window <= now <= opening + window:
+            return min_interval
+
+    upcoming = [opening - window for opening in opening_times
+                if opening - window > now]
+    if upcoming:
+        return max(min_interval, min(interval, min(upcoming) - now))
+    return interval
+
+
+class CourseWatcher:
+    """
+    Polls the status of a course on its warm webdriver session and books it
+    in the same session as soon as the booking button appears.
+    Progress messages go to 'logger', stop() ends the watch from another
+    thread.
+    """
+
+    def __init__(self, course, interval=30, min_interval=0.5,
+                 opening_times=(), window=120, logger=log):
+        self.course = course
+        self.interval = interval
+        self.min_interval = min_interval
+        self.opening_times = list(opening_times)
+        self.window = window
+        self.logger = logger
+        self._stopped = threading.Event()
+        self._add_announced_opening()
+
+    def _add_announced_opening(self):
+        opening = parse_opening_time(self.course.course_status)
+        if opening is not None and opening not in self.opening_times:
+            self.opening_times.append(opening)
+
+    def stop(self):
+        self._stopped.set()
+
+    def wait_until_bookable(self):
+        """
+        Returns True once the course is bookable, False if stopped before
+        """
+        last_status = None
+        while True:
+            if self.course.course_status != last_status:
+                last_status = self.course.course_status
+                self.logger(self.course.status())
+                self._add_announced_opening()
+
+            if self.course.is_bookable():
+                return True
+
+            if self._stopped.wait(poll_interval(
+                    time.time(), self.opening_times, self.interval,
+                    self.min_interval, self.window)):
+                return False
+            try:
+                self.course.refresh_status()
+            except LoadingFailed as e:
+                self.logger("[!] " + e.msg)
+
+    def run(self, credentials, confirmation_file=None):
+        """
+        Books the course once it is bookable. Returns False if stopped before
+        """
+        if not self.wait_until_bookable():
+            return False
+        self.logger("Booking")
+        self.course.booking(credentials, confirmation_file)
+        self.logger("Booking done")
+        return True
@@ -0,0 +1,21 @@
+import pytest
+from hsp.catalog import CourseCatalog
+from hsp.fakeserver import FakeHSPServer
+from hsp.session import HTTPSession
+
+
+@pytest.fixture
+def server():
+    with FakeHSPServer() as server:
+        yield server
+
+
+@pytest.fixture
+def session():
+    with HTTPSession() as session:
+        yield session
+
+
+@pytest.fixture
+def catalog(server, session):
+    return CourseCatalog.fetch(session, server.course_list_url)
@@ -0,0 +1,28 @@
+import pytest
+from hsp.booking import HSPCourse
+from hsp.credentials import Credentials
+from hsp.errors import InvalidCredentials
+
+
+def course_without_driver():
+    return HSPCourse.__new__(HSPCourse)
+
+
+def test_personal_fields_are_strings():
+    credentials = Credentials(name="Anton", surname="Charlston", gender="M",
+                              street="Gartenstraße", number=25,
+                              zip_code=72072, city="Tübingen",
+                              status="S-UNIT", pid=11111111,
+                              email="someone@somedomain.de")
+    fields = dict(course_without_driver()._bp_personal_fields(credentials))
+    assert fields['//input[@id="BS_F1300"][@name="strasse"]'] == \
+        "Gartenstraße 25"
+    assert fields['//input[@id="BS_F1400"][@name="ort"]'] == "72072 Tübingen"
+    assert fields['//input[@id="BS_F1700"][@name="matnr"]'] == "11111111"
+    assert all(value is None or isinstance(value, str)
+               for value in fields.values())
+
+
+def test_personal_fields_reject_invalid_credentials():
+    with pytest.raises(InvalidCredentials):
+        course_without_driver()._bp_personal_fields(Credentials(name="A"))
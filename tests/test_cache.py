@@ -0,0 +1,68 @@
+from hsp import cache
+from hsp.cache import CourseListCache
+from hsp.session import HTTPSession
+
+
+class CountingSession(HTTPSession):
+
+    closed = 0
+
+    def close(self):
+        CountingSession.closed += 1
+        super().close()
+
+
+def test_load_closes_its_own_session(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "HTTPSession", CountingSession)
+    monkeypatch.setattr(CountingSession, "closed", 0)
+    course_list = CourseListCache(str(tmp_path / "courselist.json"))
+
+    catalog = course_list.load(url=server.course_list_url)
+    assert len(catalog) == 10
+    assert CountingSession.closed == 1
+
+
+def test_load_keeps_a_passed_session_open(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(CountingSession, "closed", 0)
+    course_list = CourseListCache(str(tmp_path / "courselist.json"))
+    with CountingSession() as session:
+        course_list.load(session, url=server.course_list_url)
+        assert CountingSession.closed == 0
+        assert session._connections
+
+
+def test_fresh_cache_sends_no_request(server, session, tmp_path):
+    course_list = CourseListCache(str(tmp_path / "courselist.json"))
+    course_list.load(session, url=server.course_list_url)
+    requests = server.requests
+
+    catalog = course_list.load(session, url=server.course_list_url)
+    assert len(catalog) == 10
+    assert server.requests == requests
+
+
+def test_expired_cache_is_revalidated(server, session, tmp_path,
+                                      monkeypatch):
+    course_list = CourseListCache(str(tmp_path / "courselist.json"), ttl=0)
+    course_list.load(session, url=server.course_list_url)
+
+    parsed = []
+    parse_course_list = cache.parse_course_list
+    monkeypatch.setattr(cache, "parse_course_list",
+                        lambda *args: parsed.append(args) or
+                        parse_course_list(*args))
+    requests = server.requests
+    catalog = course_list.load(session, url=server.course_list_url)
+
+    # one conditional request, answered with 304 Not Modified
+    assert server.requests == requests + 1
+    assert parsed == []
+    assert "1009" in catalog
+
+    server.add_course({"id": "2000", "sport": "Yoga", "status": "bookable",
+                       "level": "alle", "weekday": "Mo",
+                       "time": "18:00-19:00", "location": "Halle 1"})
+    catalog = course_list.load(session, url=server.course_list_url)
+    assert server.requests == requests + 2
+    assert len(parsed) == 1
+    assert "2000" in catalog
@@ -0,0 +1,76 @@
+import pytest
+from hsp.credentials import Credentials, CredentialsStore
+from hsp.errors import InvalidCredentials
+
+
+STORE_YAML = """\
+profiles:
+  anton:
+    name: Anton
+    surname: Charlston
+    gender: M
+    street: Gartenstraße
+    number: 25
+    zipcode: 72072
+    city: Tübingen
+    status: S-UNIT
+    pid: 11111111
+    email: someone@somedomain.de
+  empty:
+    name: ""
+    surname: Charlston
+    gender: W
+    street: Gartenstraße
+    number: 25
+    zipcode:
+    city: Tübingen
+    status: Extern
+    email: someone@somedomain.de
+  listed:
+    name: [Anton]
+    surname: Charlston
+    gender: M
+    street: Gartenstraße
+    number: 25
+    zipcode: 72072
+    city: Tübingen
+    status: B-UNIT
+    pid: ""
+    email: someone@somedomain.de
+"""
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = tmp_path / "store.yml"
+    path.write_text(STORE_YAML, encoding="utf-8")
+    return CredentialsStore.load(str(path), workers=1)
+
+
+def test_store_reports_empty_values(store):
+    report = {entry["profile"]: entry for entry in store.report()}
+    assert report["anton"]["valid"]
+    assert not report["empty"]["valid"]
+    assert report["empty"]["errors"] == ["No name provided",
+                                         "No zipcode provided"]
+    assert not report["listed"]["valid"]
+    assert report["listed"]["errors"] == [
+        "'name' must be text",
+        "No matriculation number / employee phone number ('pid') provided"]
+
+
+def test_valid_profiles_can_be_booked_with(store):
+    assert store.get("anton").is_valid()
+    with pytest.raises(InvalidCredentials):
+        store.get("empty")
+
+
+def test_from_dict_rejects_empty_values():
+    with pytest.raises(InvalidCredentials) as error:
+        Credentials.from_dict({"name": " ", "surname": "B", "gender": "X",
+                               "street": "S", "number": 0, "zipcode": "1",
+                               "city": "T", "status": "Extern",
+                               "email": "a@b.de"})
+    assert error.value.errors == ["No name provided",
+                                  "Gender must be one of {'M', 'W'}",
+                                  "'number' must be a positive number or text"]
@@ -0,0 +1,105 @@
+import json
+import threading
+import pytest
+from hsp.catalog import CourseCatalog
+from hsp.daemon import HSPDaemon, connect
+from hsp.httpcourse import HTTPCourse
+
+
+CREDENTIALS = {"name": "Anton", "surname": "Charlston", "gender": "M",
+               "street": "Gartenstraße", "number": "25", "zipcode": "72072",
+               "city": "Tübingen", "status": "S-UNIT", "pid": "11111111",
+               "email": "someone@somedomain.de"}
+
+
+@pytest.fixture
+def daemon(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(CourseCatalog, "COURSE_LIST_URL",
+                        server.course_list_url)
+    daemon = HSPDaemon(str(tmp_path / "hsp.sock"), use_cache=False)
+    thread = threading.Thread(target=daemon.serve_forever,
+                              kwargs={"warm": False}, daemon=True)
+    thread.start()
+    for _ in range(100):
+        client = connect(daemon.socket_path)
+        if client is not None:
+            break
+        thread.join(0.02)
+    yield client
+    client.call("shutdown")
+    thread.join(5)
+
+
+@pytest.fixture
+def credfile(tmp_path):
+    path = tmp_path / "credentials.json"
+    path.write_text(json.dumps(CREDENTIALS), encoding="utf-8")
+    return str(path)
+
+
+def test_watch_reports_a_crash(server, daemon, credfile, tmp_path,
+                               monkeypatch):
+    def crash(self, credentials, confirmation_file=None):
+        raise RuntimeError("driver crashed")
+
+    monkeypatch.setattr(HTTPCourse, "booking", crash)
+    server.set_status("1001", "bookable")
+    result = daemon.call("watch", course="1001", credentials=credfile,
+                         confirmation_file=str(tmp_path / "ticket.html"),
+                         engine="http", interval=0.05, min_interval=0.05)
+    assert not result["ok"]
+    assert not result["stopped"]
+    assert result["error"] == "driver crashed"
+
+
+def test_watch_books(server, daemon, credfile, tmp_path):
+    server.set_status("1001", "bookable")
+    result = daemon.call("watch", course="1001", credentials=credfile,
+                         confirmation_file=str(tmp_path / "ticket.html"),
+                         engine="http", interval=0.05, min_interval=0.05)
+    assert result["ok"]
+    assert result["error"] is None
+    assert [b["course_id"] for b in server.bookings] == ["1001"]
+
+
+def test_status_refresh_reloads_the_course_list(server, daemon):
+    assert daemon.call("status", courses=["1000"],
+                       engine="http")["results"][0]["error"] is None
+    server.add_course({"id": "2000", "sport": "Yoga", "status": "bookable",
+                       "level": "alle", "weekday": "Mo",
+                       "time": "18:00-19:00", "location": "Halle 1"})
+
+    result = daemon.call("status", courses=["2000"], engine="http")
+    assert "not found" in result["results"][0]["error"]
+    result = daemon.call("status", courses=["2000"], engine="http",
+                         refresh=True)
+    assert result["results"][0]["error"] is None
+    assert result["results"][0]["status"] == "Status: booking possible"
+
+
+def test_other_browser_runs_without_daemon(credfile, tmp_path, monkeypatch):
+    from hsp.cli import parse_args
+    from hsp.main import daemon_client
+
+    socket_path = str(tmp_path / "hsp.sock")
+    daemon = HSPDaemon(socket_path, browser="headless_chrome full")
+    thread = threading.Thread(target=daemon.serve_forever,
+                              kwargs={"warm": False}, daemon=True)
+    thread.start()
+    while connect(socket_path) is None:
+        thread.join(0.02)
+
+    def client(*argv):
+        monkeypatch.setattr("sys.argv", ["hsp", "booking", "--course", "1000",
+                                         "--credentials", credfile,
+                                         "--socket", socket_path] + list(argv))
+        return daemon_client(parse_args())
+
+    try:
+        assert client() is not None
+        assert client("--use-http") is not None
+        assert client("--browser-profile", "lean") is None
+        assert client("--use-firefox") is None
+    finally:
+        connect(socket_path).call("shutdown")
+        thread.join(5)
@@ -0,0 +1,47 @@
+from hsp.feed import CourseFeed
+
+
+def kinds(events):
+    return [(event["event"], event["course_id"]) for event in events]
+
+
+def test_initial_events(catalog):
+    received = []
+    with CourseFeed(catalog, on_event=received.append) as feed:
+        events = feed.poll()
+    assert len(events) == 10
+    assert {event["event"] for event in events} == {"initial"}
+    assert received == events
+
+
+def test_only_changes_are_reported(server, catalog):
+    with CourseFeed(catalog, ["1001", "1002"]) as feed:
+        assert kinds(feed.poll()) == [("initial", "1001"),
+                                      ("initial", "1002")]
+        requests = server.requests
+        assert feed.poll() == []
+        # both courses are on one page, fetched once per poll
+        assert server.requests == requests + 1
+
+        server.set_status("1001", "bookable")
+        server.set_status("1005", "bookable")
+        events = feed.poll()
+    assert kinds(events) == [("bookable", "1001")]
+    assert events[0]["changes"]["course_status"] == \
+        ["ausgebucht", "booking possible"]
+    assert events[0]["state"]["booking_possible"]
+
+
+def test_errors_are_reported_once(server, catalog):
+    with CourseFeed(catalog, ["1001"], initial=False) as feed:
+        assert feed.poll() == []
+        server.fail_next(2)
+        events = feed.poll()
+        assert kinds(events) == [("error", "1001")]
+        assert "HTTP 503" in events[0]["error"]
+        # the same error again is not reported
+        assert feed.poll() == []
+        # nor the recovery, as nothing changed
+        assert feed.poll() == []
+        server.set_status("1001", "waitinglist")
+        assert kinds(feed.poll()) == [("waitinglist", "1001")]
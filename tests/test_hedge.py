@@ -0,0 +1,81 @@
+import threading
+import pytest
+from hsp.catalog import CourseCatalog
+from hsp.credentials import Credentials
+from hsp.errors import BookingAborted, LoadingFailed
+from hsp.fakeserver import FakeHSPServer, make_courses
+from hsp.hedge import BookingGate, HedgedBooking
+from hsp.httpcourse import HTTPCourse
+from hsp.session import HTTPSession
+
+
+CREDENTIALS = Credentials(name="Anton", surname="Charlston", gender="M",
+                          street="Gartenstraße", number="25",
+                          zip_code="72072", city="Tübingen", status="S-UNIT",
+                          pid="11111111", email="someone@somedomain.de")
+
+
+def hedged(catalog, sessions=2, delay=0, logger=None):
+    opened = []
+    lock = threading.Lock()
+
+    def open_course():
+        session = HTTPSession()
+        with lock:
+            opened.append(session)
+        return HTTPCourse("1000", session, catalog), session.close
+
+    booking = HedgedBooking(open_course, CREDENTIALS, delay=delay,
+                            sessions=sessions,
+                            logger=logger or (lambda msg: None))
+    return booking, opened
+
+
+def test_books_exactly_once_with_parallel_sessions(session, tmp_path):
+    # slow booking steps, so the second session starts before the first
+    # one reaches the confirmation
+    with FakeHSPServer(make_courses(10), latency={"booking": 0.2}) as server:
+        catalog = CourseCatalog.fetch(session, server.course_list_url)
+        booking, opened = hedged(catalog, sessions=3)
+        with booking:
+            course = booking.run(str(tmp_path / "ticket.html"))
+
+        assert len(opened) == 3
+        assert course is booking.gate.owner
+        assert len(server.bookings) == 1
+        assert server.bookings[0]["course_id"] == "1000"
+
+
+def test_failed_session_is_replaced(server, catalog, tmp_path):
+    messages = []
+    # the first session's booking page fails
+    booking, opened = hedged(catalog, sessions=2, delay=60,
+                             logger=messages.append)
+    server.fail_next(1)
+    with booking:
+        booking.run(str(tmp_path / "ticket.html"))
+
+    assert len(opened) == 2
+    assert any("HTTP 503" in message for message in messages)
+    assert len(server.bookings) == 1
+
+
+def test_gate_lets_one_session_confirm():
+    gate = BookingGate()
+    first, second = object(), object()
+    gate.step(first, "open booking page")
+    gate.step(second, "open booking page")
+    gate.step(first, BookingGate.CONFIRM)
+    with pytest.raises(BookingAborted):
+        gate.step(second, "submit personal details")
+    gate.close()
+    with pytest.raises(BookingAborted):
+        gate.step(first, BookingGate.CONFIRM)
+
+
+def test_all_sessions_failing(server, catalog, tmp_path):
+    booking, opened = hedged(catalog, sessions=2)
+    server.fail_next(1000)
+    with booking, pytest.raises(LoadingFailed):
+        booking.run(str(tmp_path / "ticket.html"))
+    assert server.bookings == []
@@ -0,0 +1,63 @@
+from hsp.credentials import Credentials
+from hsp.httpcourse import HTTPCourse
+
+
+# unquoted numbers, as people write them in YAML
+CREDENTIALS_YAML = """\
+name: Anton
+surname: Charlston
+gender: M
+street: Gartenstraße
+number: 25
+zipcode: 72072
+city: Tübingen
+status: S-UNIT
+pid: 11111111
+email: someone@somedomain.de
+"""
+
+
+def test_booking_with_numeric_yaml_credentials(server, session, catalog,
+                                               tmp_path):
+    credfile = tmp_path / "credentials.yml"
+    credfile.write_text(CREDENTIALS_YAML, encoding="utf-8")
+    credentials = Credentials.from_file(str(credfile))
+    assert credentials.zip_code == 72072
+
+    ticket = tmp_path / "ticket.html"
+    course = HTTPCourse("1000", session=session, catalog=catalog)
+    course.booking(credentials, str(ticket))
+
+    assert len(server.bookings) == 1
+    booking = server.bookings[0]
+    assert booking["course_id"] == "1000"
+    assert booking["strasse"] == "Gartenstraße 25"
+    assert booking["ort"] == "72072 Tübingen"
+    assert booking["matnr"] == "11111111"
+    assert "Buchungsnummer 1" in ticket.read_text(encoding="utf-8")
+
+
+def test_status_of_every_state(server, session, catalog):
+    page_cache = {}
+    courses = {course_id: HTTPCourse(course_id, session, catalog, page_cache)
+               for course_id in ("1000", "1001", "1002", "1003")}
+    requests = server.requests
+
+    assert courses["1000"].is_bookable()
+    assert courses["1000"].status() == "Status: booking possible"
+    assert courses["1000"].info() == "#1000: Sport 1 alle, Mo 08:00-09:30"
+    assert not courses["1001"].is_bookable()
+    assert courses["1001"].course_status == "ausgebucht"
+    assert courses["1002"].has_waitinglist()
+    assert courses["1003"].course_status == "ab 20.10., 08:00"
+    # the four courses share one course page, loaded once
+    assert server.requests == requests + 1
+
+
+def test_refresh_status(server, session, catalog):
+    course = HTTPCourse("1001", session=session, catalog=catalog)
+    assert not course.is_bookable()
+    server.set_status("1001", "bookable")
+    assert not course.is_bookable()
+    course.refresh_status()
+    assert course.is_bookable()
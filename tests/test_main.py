@@ -0,0 +1,27 @@
+from hsp.cli import parse_args
+from hsp.main import read_course_ids
+
+
+def course_ids(monkeypatch, *argv):
+    monkeypatch.setattr("sys.argv", ["hsp", "course-status"] + list(argv))
+    return read_course_ids(parse_args())
+
+
+def test_course_file_first_column(tmp_path, monkeypatch):
+    course_file = tmp_path / "courses.csv"
+    course_file.write_text('course_id,course_name\n'
+                           '3013,yoga\n'
+                           '"3014","Yoga, advanced"\n'
+                           '\n'
+                           '# 3015,not yet\n'
+                           '3016 # evening\n', encoding="utf-8")
+    assert course_ids(monkeypatch, "--course", "3013",
+                      "--course-file", str(course_file)) == \
+        ["3013", "3014", "3016"]
+
+
+def test_course_file_without_extension(tmp_path, monkeypatch):
+    course_file = tmp_path / "courses"
+    course_file.write_text("3013\n3014\n", encoding="utf-8")
+    assert course_ids(monkeypatch, "--course-file", str(course_file)) == \
+        ["3013", "3014"]
@@ -0,0 +1,80 @@
+import threading
+import time
+import pytest
+from hsp.pool import DriverPool
+
+
+class FakeSwitch:
+
+    def window(self, handle):
+        pass
+
+
+class FakeDriver:
+
+    window_handles = ["main"]
+
+    def __init__(self):
+        self.switch_to = FakeSwitch()
+        self.quit_called = False
+
+    def get(self, url):
+        pass
+
+    def delete_all_cookies(self):
+        pass
+
+    def quit(self):
+        self.quit_called = True
+
+
+class Factory:
+
+    def __init__(self, delay=0.1, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.started = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("browser did not start")
+        with self._lock:
+            self.started += 1
+        return FakeDriver()
+
+
+def test_concurrent_acquire_starts_at_most_size_drivers():
+    factory = Factory()
+    pool = DriverPool(size=2, factory=factory, prestart=False)
+    drivers = []
+
+    def use():
+        with pool.driver(timeout=5) as driver:
+            drivers.append(driver)
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(drivers) == 8
+    assert factory.started == 2
+    assert len({id(driver) for driver in drivers}) == 2
+    pool.close()
+
+
+def test_failed_start_frees_its_slot():
+    factory = Factory(delay=0, fail=True)
+    pool = DriverPool(size=1, factory=factory, prestart=False)
+    with pytest.raises(RuntimeError):
+        pool.acquire(timeout=1)
+
+    factory.fail = False
+    driver = pool.acquire(timeout=1)
+    assert isinstance(driver, FakeDriver)
+    pool.close()
+    assert driver.quit_called
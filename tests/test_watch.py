@@ -0,0 +1,56 @@
+import threading
+import time
+import pytest
+from hsp.errors import CourseNotBookable, LoadingFailed
+from hsp.httpcourse import HTTPCourse
+from hsp.schedule import ScheduledBooking
+from hsp.watch import CourseWatcher
+
+
+def open_later(server, course_id, delay=0.3):
+    timer = threading.Timer(delay, server.set_status, (course_id, "bookable"))
+    timer.start()
+    return timer
+
+
+def test_watch_survives_failed_reloads(server, session, catalog):
+    course = HTTPCourse("1001", session=session, catalog=catalog)
+    messages = []
+    watcher = CourseWatcher(course, interval=0.02, min_interval=0.02,
+                            logger=messages.append)
+    server.fail_next(2)
+    open_later(server, "1001")
+
+    assert watcher.wait_until_bookable()
+    failures = [m for m in messages if "HTTP 503" in m]
+    assert len(failures) == 2
+    assert messages[-1] == "Status: booking possible"
+
+
+def test_failed_reload_keeps_status(server, session, catalog):
+    course = HTTPCourse("1001", session=session, catalog=catalog)
+    assert course.course_status == "ausgebucht"
+    server.fail_next(1)
+    with pytest.raises(LoadingFailed):
+        course.refresh_status()
+    requests = server.requests
+    assert course.course_status == "ausgebucht"
+    assert not course.is_bookable()
+    assert server.requests == requests
+
+
+def test_scheduled_booking_survives_failed_reloads(server, session, catalog):
+    course = HTTPCourse("1001", session=session, catalog=catalog)
+    booking = ScheduledBooking(course, None, time.time(), grace=5, poll=0.02)
+    server.fail_next(2)
+    open_later(server, "1001")
+    booking.wait_until_bookable()
+    assert course.is_bookable()
+
+
+def test_scheduled_booking_gives_up_after_grace(server, session, catalog):
+    course = HTTPCourse("1001", session=session, catalog=catalog)
+    booking = ScheduledBooking(course, None, time.time(), grace=0.1, poll=0.02)
+    server.fail_next(1000)
+    with pytest.raises(CourseNotBookable):
+        booking.wait_until_bookable()